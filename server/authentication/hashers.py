@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+# Perfiles de hashers (settings.PASSWORD_HASHER_PROFILE). El primero de cada
+# lista cifra las contraseñas nuevas; los demás sólo verifican las antiguas,
+# que Django vuelve a cifrar con el preferido en el siguiente login
+PROFILES = {
+    'pbkdf2': 'authentication.hashers.PBKDF2PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+}
+
+
+def password_hashers(profile):
+    preferred = PROFILES[profile]
+    return [preferred] + [hasher for hasher in [
+        *PROFILES.values(),
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    ] if hasher != preferred]
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    # Mismo algoritmo que el de Django con las iteraciones configurables en
+    # PASSWORD_PBKDF2_ITERATIONS; al cambiarlas los hashes se actualizan en
+    # el siguiente login (must_update compara las iteraciones)
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or super().iterations
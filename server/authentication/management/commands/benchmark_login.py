@@ -0,0 +1,92 @@
+import time
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from authentication.hashers import PROFILES, password_hashers
+
+PASSWORD = 'benchmark-password'
+SESSION_BACKENDS = ['db', 'cached_db', 'cache', 'signed_cookies']
+
+
+class Command(BaseCommand):
+    help = ('Mide los logins por segundo en un núcleo con cada perfil de '
+            'hashers y el coste de las sesiones en una petición autenticada '
+            '(los datos se descartan al terminar)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=200)
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for profile in PROFILES:
+                with override_settings(
+                        PASSWORD_HASHERS=password_hashers(profile)):
+                    self.benchmark_profile(profile, options['logins'])
+            for backend in SESSION_BACKENDS:
+                engine = 'django.contrib.sessions.backends.' + backend
+                with override_settings(SESSION_ENGINE=engine):
+                    self.benchmark_session(backend, options['requests'])
+            transaction.set_rollback(True)
+
+    def check_response(self, response, url):
+        if response.status_code != 200:
+            raise CommandError(f'{url} devolvió {response.status_code}')
+
+    def create_user(self, name, password):
+        return get_user_model().objects.create(
+            username=name, email=f'{name}@example.com', password=password)
+
+    def benchmark_profile(self, profile, logins):
+        try:
+            start = time.perf_counter()
+            hashed = make_password(PASSWORD)
+            hash_time = (time.perf_counter() - start) * 1000
+        except ValueError as error:
+            self.stdout.write(f'{profile}: no disponible ({error})')
+            return
+
+        user = self.create_user(f'login-{profile}', hashed)
+        client = Client(HTTP_HOST='localhost')
+        start = time.perf_counter()
+        for _ in range(logins):
+            response = client.post('/api/auth/login/', {
+                'email': user.email, 'password': PASSWORD},
+                content_type='application/json')
+            self.check_response(response, '/api/auth/login/')
+        elapsed = time.perf_counter() - start
+
+        # Un hash de otro perfil se actualiza al hacer login
+        legacy = self.create_user(
+            f'legacy-{profile}', make_password(PASSWORD, hasher='pbkdf2_sha1'))
+        response = client.post('/api/auth/login/', {
+            'email': legacy.email, 'password': PASSWORD},
+            content_type='application/json')
+        self.check_response(response, '/api/auth/login/')
+        legacy.refresh_from_db()
+        rehashed = identify_hasher(legacy.password).algorithm
+
+        self.stdout.write(
+            f'{profile:8} hash {hash_time:7.1f}ms  '
+            f'{logins / elapsed:7.1f} logins/s por núcleo  '
+            f'pbkdf2_sha1 -> {rehashed}')
+
+    def benchmark_session(self, backend, requests):
+        user = self.create_user(f'session-{backend}', make_password(PASSWORD))
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        self.check_response(client.get('/api/userfilms/'), '/api/userfilms/')
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(requests):
+                self.check_response(
+                    client.get('/api/userfilms/'), '/api/userfilms/')
+            elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'sesiones {backend:15} {elapsed / requests * 1000:6.2f}ms '
+            f'por petición  '
+            f'{len(queries.captured_queries) / requests:.0f} consultas')
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.signals import post_save
+from server.images import remember_image_names, update_image_variants
 
 
 def path_to_avatar(instance, filename):
@@ -11,6 +13,19 @@ class CustomUser(AbstractUser):
         max_length=150, unique=True)
     avatar = models.ImageField(
         upload_to=path_to_avatar, null=True, blank=True)
+    image_variants = models.JSONField(
+        default=dict, blank=True, editable=False)  # ver server/images.py
+
+    IMAGE_SIZES = {'avatar': [64, 128, 256]}
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'password']
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        remember_image_names(instance, field_names)
+        return instance
+
+
+post_save.connect(update_image_variants, sender=CustomUser)
@@ -1,9 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
+from server.images import SrcsetField
+from films.models import UserStats
+from server.metrics import TimedSerializerMixin
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     email = serializers.EmailField(
         required=True)
     username = serializers.CharField(
@@ -12,13 +15,12 @@ class UserSerializer(serializers.ModelSerializer):
         min_length=8, write_only=True)
     avatar = serializers.ImageField(
         required=False, allow_null=True)
+    avatar_srcset = SrcsetField('avatar')
 
     class Meta:
         model = get_user_model()
-        fields = ('email', 'username', 'password', 'avatar')  # edited
-
-    def validate_password(self, value):
-        return make_password(value)
+        fields = ('email', 'username', 'password', 'avatar',
+                  'avatar_srcset')
 
     def validate_username(self, value):
         value = value.replace(" ", "")  # Ya que estamos borramos los espacios
@@ -40,6 +42,27 @@ class UserSerializer(serializers.ModelSerializer):
         # En cualquier otro caso la validación fallará
         raise serializers.ValidationError("Email en uso")
 
+    # La contraseña se cifra sólo cuando todos los campos son válidos: el
+    # hasher es lo más caro de la petición
+
+    def create(self, validated_data):
+        validated_data['password'] = make_password(validated_data['password'])
+        return super().create(validated_data)
+
     def update(self, instance, validated_data):
         validated_data.pop('email', None)               # prevenimos el borrado
+        if 'password' in validated_data:
+            validated_data['password'] = make_password(
+                validated_data['password'])
         return super().update(instance, validated_data)  # seguimos la ejecución
+
+
+class ProfileSerializer(UserSerializer):
+    # Contadores de la lista del usuario con su desglose por género
+    stats = serializers.SerializerMethodField()
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ('stats',)
+
+    def get_stats(self, user):
+        return UserStats.objects.summary(user)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.mail import send_mail
+from django_rest_passwordreset.models import ResetPasswordToken
+from jobs.queue import task
+
+
+@task('authentication.send_password_reset')
+def send_password_reset(token_id):
+    try:
+        token = ResetPasswordToken.objects.select_related(
+            'user').get(pk=token_id)
+    except ResetPasswordToken.DoesNotExist:
+        return  # El token ya se ha usado o ha caducado
+
+    send_mail(
+        'Recupera tu contraseña',
+        f"Recupera la contraseña del correo '{token.user.email}' usando el "
+        f"token '{token.key}' desde la API "
+        f"http://localhost:8000/api/auth/reset/confirm/.\n\n"
+        f"También puedes hacerlo directamente desde el cliente web en "
+        f"http://localhost:3000/new-password/?token={token.key}.\n",
+        settings.DEFAULT_FROM_EMAIL, [token.user.email])
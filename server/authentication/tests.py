@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from films.models import Film, FilmGenre, FilmUser
+
+
+class ProfileQueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='user', email='user@example.com', password='password')
+        genres = [FilmGenre.objects.create(name=f'Género {i}')
+                  for i in range(4)]
+        for i in range(20):
+            film = Film.objects.create(title=f'Película {i}', year=2000 + i)
+            film.genres.set(genres[:i % 4 + 1])
+            FilmUser.objects.create(user=cls.user, film=film, state=1,
+                                    note=i % 10 + 1)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_profile(self):
+        # Sesión, usuario y sus estadísticas, sin recorrer sus películas
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/user/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stats']['notes_count'], 20)
+
+
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, **extra):
+        return self.client.post('/api/auth/login/', {
+            'email': 'nadie@example.com', 'password': 'password'}, **extra)
+
+    def test_throttled(self):
+        # 'login': 10/min
+        for _ in range(10):
+            self.assertEqual(self.login().status_code, 404)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_spoofed_forwarded_for(self):
+        # Sin proxies de confianza X-Forwarded-For no cambia el cubo
+        for i in range(10):
+            self.login(HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+        response = self.login(HTTP_X_FORWARDED_FOR='10.0.0.99')
+        self.assertEqual(response.status_code, 429)
@@ -3,13 +3,15 @@ from django.contrib.auth import get_user_model
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .serializers import UserSerializer
+from .serializers import ProfileSerializer, UserSerializer
 
 from django.dispatch import receiver
 from django_rest_passwordreset.signals import reset_password_token_created
+from jobs.queue import enqueue
 
 
 class LoginView(APIView):
+    throttle_scope = 'login'
 
     def post(self, request):
         # Recuperamos las credenciales y autenticamos al usuario
@@ -39,19 +41,19 @@ class LogoutView(APIView):
 
 class SignupView(generics.CreateAPIView):
     serializer_class = UserSerializer
+    throttle_scope = 'signup'
 
 
 @receiver(reset_password_token_created)
 def password_reset_token_created(sender, instance, reset_password_token, *args, **kwargs):
-    # Aquí deberíamos mandar un correo al cliente...
-    print(
-        f"\nRecupera la contraseña del correo '{reset_password_token.user.email}' usando el token '{reset_password_token.key}' desde la API http://localhost:8000/api/auth/reset/confirm/.\n\n"
-
-        f"También puedes hacerlo directamente desde el cliente web en http://localhost:3000/new-password/?token={reset_password_token.key}.\n")
+    # El correo se manda desde el worker (ver tasks.py)
+    enqueue('authentication.send_password_reset',
+            {'token_id': reset_password_token.pk},
+            dedup_key=f'password-reset:{reset_password_token.pk}')
 
 
 class ProfileView(generics.RetrieveUpdateAPIView):
-    serializer_class = UserSerializer
+    serializer_class = ProfileSerializer
     http_method_names = ['get', 'patch']
 
     def get_object(self):
@@ -0,0 +1,155 @@
+import math
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+from rest_framework.utils.urls import replace_query_param
+from server.renderers import FastJSONRenderer
+from .models import FilmUserTombstone
+from .views import (ExtendedPagination, FilmUserPagination, FilmUserViewSet,
+                    FilmViewSet, GenreViewSet)
+
+# Variantes asíncronas (ASGI) de los endpoints de lectura. Los filtros,
+# búsquedas y ordenaciones son los mismos de las vistas DRF: se construye el
+# queryset con ellas y se evalúa con el ORM asíncrono
+
+
+def build_view(viewset_class, request, user=None, **kwargs):
+    view = viewset_class(
+        request=Request(request), kwargs=kwargs, format_kwarg=None,
+        action='retrieve' if kwargs else 'list')
+    if user is not None:
+        view.request.user = user
+    return view
+
+
+@sync_to_async
+def filtered_queryset(view):
+    # Puede validar filtros contra la base de datos (p. ej. el género)
+    return view.filter_queryset(view.get_queryset())
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status,
+                        content_type=FastJSONRenderer.media_type)
+
+
+def json_errors(view):
+    # Los errores se devuelven en JSON como en las vistas DRF
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except APIException as error:
+            data = error.detail if isinstance(error.detail, (list, dict)) \
+                else {'detail': error.detail}
+            return json_response(data, status=error.status_code)
+        except Http404:
+            return json_response(
+                {'detail': NotFound.default_detail}, status=404)
+    return wrapper
+
+
+async def paginated_data(request, view, queryset, pagination_class):
+    page_size = pagination_class.page_size
+    if pagination_class.page_size_query_param:
+        try:
+            page_size = min(
+                int(request.GET[pagination_class.page_size_query_param]),
+                pagination_class.max_page_size)
+        except (KeyError, ValueError):
+            pass
+    try:
+        page_number = int(request.GET.get('page', 1))
+    except ValueError:
+        raise NotFound(pagination_class.invalid_page_message)
+
+    count = await queryset.acount()
+    num_pages = max(math.ceil(count / page_size), 1)
+    if not 1 <= page_number <= num_pages:
+        raise NotFound(pagination_class.invalid_page_message)
+
+    offset = (page_number - 1) * page_size
+    objects = [obj async for obj in queryset[offset:offset + page_size]]
+    serializer = view.get_serializer(objects, many=True)
+
+    url = request.build_absolute_uri()
+    next_link = previous_link = None
+    if page_number < num_pages:
+        next_link = replace_query_param(url, 'page', page_number + 1)
+    if page_number > 1:
+        previous_link = replace_query_param(url, 'page', page_number - 1)
+
+    return {
+        'count': count,
+        'num_pages': num_pages,
+        'page_number': page_number,
+        'page_size': page_size,
+        'next_link': next_link and next_link.split('/')[-1],
+        'previous_link': previous_link and previous_link.split('/')[-1],
+        'results': serializer.data,
+    }
+
+
+async def retrieve_response(view, queryset, **lookup):
+    try:
+        obj = await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404
+    return json_response(view.get_serializer(obj).data)
+
+
+@json_errors
+async def film_list(request):
+    view = build_view(FilmViewSet, request)
+    queryset = await filtered_queryset(view)
+    return json_response(await paginated_data(
+        request, view, queryset, ExtendedPagination))
+
+
+@json_errors
+async def film_detail(request, pk):
+    view = build_view(FilmViewSet, request, pk=str(pk))
+    return await retrieve_response(view, view.get_queryset(), pk=pk)
+
+
+@json_errors
+async def genre_list(request):
+    view = build_view(GenreViewSet, request)
+    queryset = await filtered_queryset(view)
+    genres = [genre async for genre in queryset]
+    return json_response(view.get_serializer(genres, many=True).data)
+
+
+@json_errors
+async def genre_detail(request, slug):
+    view = build_view(GenreViewSet, request, slug=slug)
+    return await retrieve_response(view, view.get_queryset(), slug=slug)
+
+
+@json_errors
+async def userfilm_list(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return json_response(
+            {'detail': 'Las credenciales de autenticación no se proveyeron.'},
+            status=403)
+    view = build_view(FilmUserViewSet, request, user=user)
+    sync_token = timezone.now().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    since = view.get_since()
+
+    queryset = await filtered_queryset(view)
+    if since:
+        queryset = queryset.filter(
+            updated_at__gte=since).order_by('updated_at', 'pk')
+
+    data = await paginated_data(request, view, queryset, FilmUserPagination)
+    data['sync_token'] = sync_token
+    if since:
+        data['deleted'] = [film_id async for film_id in (
+            FilmUserTombstone.objects.filter(
+                user=user, deleted_at__gte=since).values_list(
+                    'film_id', flat=True).distinct())]
+    return json_response(data)
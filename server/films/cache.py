@@ -0,0 +1,153 @@
+import hashlib
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+from server.database import read_from_primary
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE]
+
+
+def version_key(name):
+    return f'catalog:version:{name}'
+
+
+# Hasta cuándo pueden ir las réplicas por detrás del último cambio de versión
+PRIMARY_UNTIL_KEY = 'catalog:primary-until'
+
+
+# Cada recurso tiene una versión: al cambiarla las respuestas cacheadas que
+# dependían de ella dejan de encontrarse y caducan solas
+def get_versions(*names):
+    cache = get_cache()
+    keys = [version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*names):
+    get_cache().set_many({
+        **{version_key(name): uuid.uuid4().hex for name in names},
+        PRIMARY_UNTIL_KEY:
+            time.time() + settings.DATABASE_REPLICA_STICKY_SECONDS,
+    }, None)
+
+
+def invalidate_film_stats(*film_ids):
+    # Cada nota cambia el detalle de su película, los listados en los que
+    # aparece (ver cache_dependencies) y los que se ordenan o filtran por los
+    # contadores ('film-stats'), no todo el catálogo
+    bump_versions('film-stats', *[f'film:{pk}' for pk in film_ids])
+
+
+def invalidate_film(sender, instance, **kwargs):
+    # Los géneros anidan las películas (título, miniatura)
+    bump_versions('films', f'film:{instance.pk}', 'genres')
+
+
+def invalidate_genre(sender, instance, **kwargs):
+    # Los detalles de película dependen de la versión de los géneros
+    bump_versions('films', 'genres')
+
+
+def invalidate_film_genres(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_versions('films', 'genres')
+
+
+class CachedResponseMixin:
+    # Caché de las respuestas JSON de las vistas de sólo lectura
+    cache_timeout = None
+    cache_key = None
+    cache_dependencies = ()
+
+    def get_cache_versions(self):
+        raise NotImplementedError
+
+    def get_cache_dependencies(self, page):
+        # Versiones de los objetos de la página: se comprueban al leer la
+        # respuesta de la caché en lugar de formar parte de la clave
+        return []
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self.cache_dependencies = self.get_cache_dependencies(page)
+        return page
+
+    def is_fresh(self, entry):
+        dependencies = entry.get('dependencies')
+        return not dependencies or \
+            get_cache().get_many(list(dependencies)) == dependencies
+
+    def get_cache_key(self, request):
+        params = sorted(
+            (key, sorted(values)) for key, values in request.query_params.lists())
+        raw = repr((request.path, params, request.accepted_renderer.format,
+                    self.get_cache_versions()))
+        return 'catalog:response:' + hashlib.md5(raw.encode()).hexdigest()
+
+    def cached(self, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+
+        self.cache_key = self.get_cache_key(request)
+        entry = get_cache().get(self.cache_key)
+        if entry is None or not self.is_fresh(entry):
+            if settings.DATABASE_REPLICAS and \
+                    get_cache().get(PRIMARY_UNTIL_KEY, 0) > time.time():
+                # Una réplica retrasada guardaría datos anteriores al cambio
+                # bajo la versión nueva: tras un cambio se rellena la caché
+                # desde la primaria
+                read_from_primary()
+            return handler(request, *args, **kwargs)
+
+        response = HttpResponse(
+            entry['content'], content_type=entry['content_type'])
+        return self.conditional_response(request, response, entry)
+
+    def conditional_response(self, request, response, entry):
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        return get_conditional_response(
+            request, etag=entry['etag'],
+            last_modified=entry['last_modified'], response=response)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        cache_key = self.cache_key
+        if (cache_key is None or not isinstance(response, Response)
+                or response.status_code != 200):
+            return response
+
+        # Renderizamos aquí para guardar el contenido final en la caché
+        response.render()
+        entry = {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': '"%s"' % hashlib.md5(response.content).hexdigest(),
+            'last_modified': int(time.time()),
+            'dependencies': dict(zip(
+                map(version_key, self.cache_dependencies),
+                get_versions(*self.cache_dependencies))),
+        }
+        timeout = self.cache_timeout or settings.CATALOG_CACHE_TIMEOUT
+        get_cache().set(cache_key, entry, timeout)
+        return self.conditional_response(request, response, entry)
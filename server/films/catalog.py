@@ -0,0 +1,154 @@
+import csv
+import json
+import uuid
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.utils.text import slugify
+from .models import Film, FilmGenre, FilmUser
+
+# Exportación e importación del catálogo por secciones (un fichero NDJSON o
+# CSV por sección) recorriendo las tablas por bloques. Los géneros de cada
+# película van en su fila (en CSV separados por |), los FilmUser referencian
+# al usuario por su username y las imágenes se exportan por su nombre en el
+# almacenamiento, sin el fichero
+
+SECTIONS = {
+    'genres': ['name', 'slug'],
+    'films': ['id', 'title', 'year', 'review_short', 'review_large',
+              'trailer_url', 'image_thumbnail', 'image_wallpaper', 'genres'],
+    'filmusers': ['film', 'user', 'state', 'favorite', 'note', 'review'],
+}
+
+FORMATS = ['ndjson', 'csv']
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def export_genres(chunk_size):
+    genres = FilmGenre.objects.order_by('pk').values_list('name', 'slug')
+    for name, slug in genres.iterator(chunk_size):
+        yield {'name': name, 'slug': slug}
+
+
+def export_films(chunk_size):
+    films = Film.objects.order_by('pk').only(*SECTIONS['films'][:-1]) \
+        .prefetch_related(Prefetch(
+            'genres', queryset=FilmGenre.objects.only('id', 'slug')))
+    for film in films.iterator(chunk_size):
+        yield {
+            'id': str(film.pk), 'title': film.title, 'year': film.year,
+            'review_short': film.review_short,
+            'review_large': film.review_large,
+            'trailer_url': film.trailer_url,
+            'image_thumbnail': film.image_thumbnail.name or None,
+            'image_wallpaper': film.image_wallpaper.name or None,
+            'genres': [genre.slug for genre in film.genres.all()],
+        }
+
+
+def export_filmusers(chunk_size):
+    # Ordenados por película para que al importar cada lote recalcule las
+    # estadísticas de pocas películas
+    rows = FilmUser.objects.order_by('film', 'user').values_list(
+        'film', 'user__username', 'state', 'favorite', 'note', 'review')
+    for row in rows.iterator(chunk_size):
+        yield dict(zip(SECTIONS['filmusers'], row), film=str(row[0]))
+
+
+EXPORTERS = {
+    'genres': export_genres,
+    'films': export_films,
+    'filmusers': export_filmusers,
+}
+
+
+def write_rows(file, format, section, rows):
+    count = 0
+    if format == 'ndjson':
+        for count, row in enumerate(rows, 1):
+            file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return count
+    writer = csv.DictWriter(file, SECTIONS[section])
+    writer.writeheader()
+    for count, row in enumerate(rows, 1):
+        if 'genres' in row:
+            row['genres'] = '|'.join(row['genres'])
+        writer.writerow(row)
+    return count
+
+
+def parse_csv_row(section, row):
+    # En CSV los nulos son cadenas vacías y todo llega como texto
+    row = {field: value if value != '' else None
+           for field, value in row.items()}
+    if section == 'films':
+        row['year'] = int(row['year'])
+        row['genres'] = row['genres'].split('|') if row['genres'] else []
+    elif section == 'filmusers':
+        row['state'] = int(row['state'])
+        row['favorite'] = row['favorite'] in ('True', 'true', '1')
+        row['note'] = int(row['note']) if row['note'] is not None else None
+    return row
+
+
+def read_rows(file, format, section):
+    if format == 'ndjson':
+        return (json.loads(line) for line in file if line.strip())
+    return (parse_csv_row(section, row) for row in csv.DictReader(file))
+
+
+# Las importaciones sólo insertan (ignore_conflicts): repetir un lote tras un
+# fallo no duplica filas y las que ya existían se mantienen
+
+def import_genres(rows):
+    FilmGenre.objects.bulk_create([
+        FilmGenre(name=row['name'], slug=slugify(row['name']))
+        for row in rows], ignore_conflicts=True)
+    return 0
+
+
+def import_films(rows):
+    genre_ids = dict(FilmGenre.objects.filter(slug__in={
+        slug for row in rows for slug in row['genres']}).values_list(
+            'slug', 'pk'))
+    fields = SECTIONS['films'][:-1]
+    Film.objects.bulk_create([
+        Film(**{field: row[field] for field in fields}) for row in rows],
+        ignore_conflicts=True)
+    through = Film.genres.through
+    through.objects.bulk_create([
+        through(film_id=row['id'], filmgenre_id=genre_ids[slug])
+        for row in rows for slug in row['genres'] if slug in genre_ids],
+        ignore_conflicts=True)
+    Film.objects.filter(pk__in=[row['id'] for row in rows]).reindex_search()
+    return sum(slug not in genre_ids for row in rows for slug in row['genres'])
+
+
+def import_filmusers(rows):
+    # Las filas de usuarios o películas que no existen se descartan
+    user_ids = dict(get_user_model().objects.filter(
+        username__in={row['user'] for row in rows}).values_list(
+            'username', 'pk'))
+    film_ids = set(Film.objects.filter(
+        pk__in={row['film'] for row in rows}).values_list('pk', flat=True))
+    filmusers = [
+        FilmUser(film_id=row['film'], user_id=user_ids[row['user']],
+                 state=row['state'], favorite=row['favorite'],
+                 note=row['note'], review=row['review'])
+        for row in rows
+        if row['user'] in user_ids and uuid.UUID(row['film']) in film_ids]
+    FilmUser.objects.bulk_create(filmusers, ignore_conflicts=True)
+    Film.objects.filter(pk__in=film_ids).rebuild_stats()
+    return len(rows) - len(filmusers)
+
+
+IMPORTERS = {
+    'genres': import_genres,
+    'films': import_films,
+    'filmusers': import_filmusers,
+}
@@ -0,0 +1,147 @@
+import threading
+from .cache import get_versions
+from .models import Film, FilmGenre
+from .search import query_terms
+
+# Índice de facetas en memoria: cada película ocupa una posición y cada valor
+# de faceta (género, década, tramo de nota media y año) es un bitset (int de
+# Python) con las posiciones de sus películas. Los recuentos de una petición
+# son intersecciones (&) y bit_count() en lugar de un GROUP BY por faceta. El
+# índice se reconstruye en cada proceso cuando cambia la versión 'films' de la
+# caché del catálogo; los tramos de nota, que cambian con cada nota, sólo se
+# releen al pedirlos tras un cambio de 'film-stats'
+
+FACETS = ['genres', 'decade', 'rating']
+
+
+def decade(year):
+    return year // 10 * 10
+
+
+def rating_bucket(notes_count, average_note):
+    # Tramos por la parte entera de la media; sin notas no hay tramo
+    return int(average_note) if notes_count else None
+
+
+def to_bitset(positions, size):
+    bitmap = bytearray(size // 8 + 1)
+    for position in positions:
+        bitmap[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+class FacetIndex:
+
+    def __init__(self, version, stats_version):
+        self.version = version
+        self.stats_version = stats_version
+        films = list(Film.objects.order_by().values_list(
+            'pk', 'year', 'notes_count', 'average_note'))
+        self.positions = {pk: position
+                          for position, (pk, *_) in enumerate(films)}
+        self.all = (1 << len(films)) - 1
+
+        values = {facet: {} for facet in ['genres', 'decade', 'year']}
+        values['genres'] = {pk: [] for pk in FilmGenre.objects.values_list(
+            'pk', flat=True)}
+        for position, (_, year, _, _) in enumerate(films):
+            values['year'].setdefault(year, []).append(position)
+            values['decade'].setdefault(decade(year), []).append(position)
+        for film, genre in Film.genres.through.objects.values_list(
+                'film_id', 'filmgenre_id'):
+            values['genres'].setdefault(genre, []).append(
+                self.positions[film])
+
+        self.bitsets = {
+            facet: self.to_bitsets(facet_values)
+            for facet, facet_values in values.items()}
+        self.bitsets['rating'] = self.rating_bitsets(films)
+
+    def to_bitsets(self, values):
+        return {value: to_bitset(positions, len(self.positions))
+                for value, positions in sorted(values.items())}
+
+    def rating_bitsets(self, films):
+        values = {}
+        for pk, _, notes_count, average_note in films:
+            bucket = rating_bucket(notes_count, average_note)
+            if bucket is not None and pk in self.positions:
+                values.setdefault(bucket, []).append(self.positions[pk])
+        return self.to_bitsets(values)
+
+    def refresh_ratings(self, stats_version):
+        # Las películas son las mismas (misma versión 'films'): sólo se
+        # releen sus contadores
+        self.bitsets['rating'] = self.rating_bitsets(
+            Film.objects.order_by().values_list(
+                'pk', 'year', 'notes_count', 'average_note'))
+        self.stats_version = stats_version
+
+    def bitset(self, pks):
+        return to_bitset((self.positions[pk] for pk in pks
+                          if pk in self.positions), len(self.positions))
+
+    def years(self, gte=None, lte=None):
+        bitset = 0
+        for year, films in self.bitsets['year'].items():
+            if (gte is None or year >= gte) and (lte is None or year <= lte):
+                bitset |= films
+        return bitset
+
+    def union(self, facet, values):
+        bitset = 0
+        for value in values:
+            bitset |= self.bitsets[facet].get(value, 0)
+        return bitset
+
+    def counts(self, base, facets, selected):
+        # Cada faceta se cuenta con los demás filtros pero sin el suyo, así
+        # se ve cuántas películas habría al cambiar de valor. Varios valores
+        # de una faceta (?genres=1&genres=2) suman sus películas
+        filters = {facet: self.union(facet, values)
+                   for facet, values in selected.items() if values}
+        counts = {}
+        for facet in facets:
+            films = base
+            for other, bitset in filters.items():
+                if other != facet:
+                    films &= bitset
+            counts[facet] = {value: (films & bitset).bit_count()
+                             for value, bitset in self.bitsets[facet].items()}
+        return counts
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index(ratings=False):
+    global _index
+    version, stats_version = get_versions('films', 'film-stats')
+    with _lock:
+        if _index is None or _index.version != version:
+            _index = FacetIndex(version, stats_version)
+        elif ratings and _index.stats_version != stats_version:
+            _index.refresh_ratings(stats_version)
+        return _index
+
+
+def facet_counts(params, facets=FACETS):
+    # params: filtros ya validados por FilmFilterSet (los géneros en una
+    # lista) y la búsqueda. La década se normaliza como en el filtro
+    # (?decade=1995 es la de 1990)
+    index = get_index(ratings='rating' in facets or 'rating' in params)
+    base = index.all
+    if params.get('year__gte') is not None or \
+            params.get('year__lte') is not None:
+        base &= index.years(params.get('year__gte'), params.get('year__lte'))
+    if query_terms(params.get('search') or ''):
+        # La búsqueda no tiene bitsets: sus películas salen del índice de
+        # tokens en una consulta
+        base &= index.bitset(Film.objects.search(
+            params['search']).values_list('pk', flat=True))
+    return index.counts(base, facets, {
+        'genres': params.get('genres', []),
+        'decade': [decade(params['decade'])] if 'decade' in params else [],
+        'rating': [params['rating']] if 'rating' in params else [],
+    })
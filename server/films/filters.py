@@ -0,0 +1,47 @@
+import django_filters
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters
+from .facets import decade
+from .models import Film
+from .search import query_terms
+
+
+class FilmSearchFilter(filters.SearchFilter):
+    # Búsqueda sobre el índice de tokens en lugar de LIKE '%term%'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query_terms(query):
+            return queryset
+        return queryset.search(query)
+
+
+class FilmFilterSet(django_filters.FilterSet):
+    # Década (1990) y tramo de nota media (7 = de 7 a 8), los mismos valores
+    # que las facetas (ver facets.py)
+    decade = django_filters.NumberFilter(method='filter_decade')
+    rating = django_filters.NumberFilter(method='filter_rating')
+
+    class Meta:
+        model = Film
+        fields = {
+            'year': ['lte', 'gte'],  # Año menor o igual, año mayor o igual
+            'genres': ['exact']      # Género exacto
+        }
+
+    def filter_decade(self, queryset, name, value):
+        start = decade(int(value))
+        return queryset.filter(year__gte=start, year__lt=start + 10)
+
+    def filter_rating(self, queryset, name, value):
+        return queryset.filter(notes_count__gt=0, average_note__gte=int(value),
+                               average_note__lt=int(value) + 1)
+
+
+class FilmFilterBackend(DjangoFilterBackend):
+    # Guarda en la vista el filterset validado para calcular las facetas
+    # con los mismos filtros
+
+    def get_filterset(self, request, queryset, view):
+        view.filterset = super().get_filterset(request, queryset, view)
+        return view.filterset
@@ -0,0 +1,263 @@
+import json
+import statistics
+import time
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django_rest_passwordreset.models import ResetPasswordToken
+from films.rankings import RANKINGS, refresh_ranking
+from films.synthetic import (create_films, create_genres, create_ratings,
+                             create_users)
+from films.views import ExtendedPagination
+
+
+class Command(BaseCommand):
+    help = ('Mide peticiones/s, latencias p50/p95/p99 y consultas por '
+            'petición de todas las rutas de la API sobre un catálogo '
+            'sintético, sin red ni servicios externos. Con --baseline falla '
+            'si alguna ruta empeora (los datos se descartan al terminar)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--films', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--ratings', type=int, default=20000)
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--only', help='Sólo las rutas que lo contengan')
+        parser.add_argument('--cache', action='store_true',
+                            help='Mantener la caché del catálogo')
+        parser.add_argument('--json', help='Guardar los resultados')
+        parser.add_argument('--baseline',
+                            help='Resultados anteriores a comparar')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Aumento admitido de la latencia p50')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+
+        # Sin límites de peticiones y con un hasher rápido: el coste de los
+        # hashers se mide en benchmark_login. Los clientes de pruebas (también
+        # AsyncClient) envían Host: testserver
+        overrides = {
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+            'THROTTLE_ENABLED': False,
+            'PASSWORD_HASHERS': [
+                'django.contrib.auth.hashers.MD5PasswordHasher'],
+        }
+        if not options['cache']:
+            overrides['CACHES'] = {**settings.CACHES, 'benchmark': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+            overrides['CATALOG_CACHE'] = 'benchmark'
+
+        results = {}
+        with override_settings(**overrides), transaction.atomic():
+            start = time.perf_counter()
+            genres = create_genres()
+            films = create_films(options['films'], genres)
+            users = create_users(options['users'])
+            create_ratings(options['ratings'], users, films)
+            for kind in RANKINGS:
+                refresh_ranking(kind)
+            self.stdout.write(
+                f"Catálogo sintético: {options['films']} películas, "
+                f"{options['users']} usuarios y {options['ratings']} notas "
+                f'en {time.perf_counter() - start:.1f}s')
+
+            clients = {'anon': Client(), 'user': Client(),
+                       'async': AsyncClient()}
+            clients['user'].force_login(users[0])
+            clients['async'].force_login(users[0])
+            for name, client, method, url, data in self.get_cases(
+                    films, genres, users):
+                if options['only'] and options['only'] not in name:
+                    continue
+                results[name] = self.run_case(
+                    clients.get(client), method, url, data,
+                    options['requests'])
+                self.report(name, results[name])
+            transaction.set_rollback(True)
+
+        if options['json']:
+            with open(options['json'], 'w') as file:
+                json.dump(results, file, indent=2)
+        if baseline is not None:
+            failures = self.compare(results, baseline, options['tolerance'])
+            if failures:
+                raise CommandError(
+                    'Rutas más lentas que la referencia:\n' +
+                    '\n'.join(failures))
+            self.stdout.write(self.style.SUCCESS(
+                'Sin regresiones respecto a la referencia'))
+
+    def get_cases(self, films, genres, users):
+        # (nombre, cliente, método, url, datos); la url y los datos pueden
+        # depender del número de petición. Con el cliente None cada petición
+        # usa uno nuevo
+        genre = genres[0]
+        middle_page = max(1, len(films) // ExtendedPagination.page_size // 2)
+
+        def film_url(i):
+            return f'/api/films/{films[i % len(films)].pk}/'
+
+        def rating(i):
+            return {'uuid': str(films[i % len(films)].pk), 'state': 1,
+                    'note': i % 10 + 1}
+
+        def batch(i):
+            return [rating(i * 20 + j) for j in range(20)]
+
+        def login(i):
+            return {'email': users[i % len(users)].email,
+                    'password': 'benchmark'}
+
+        def signup(i):
+            return {'email': f'signup{i}@example.com',
+                    'username': f'signup{i}', 'password': 'benchmark-1234'}
+
+        def profile(i):
+            return {'username': f'profile{i}'}
+
+        def reset_token(i):
+            # Cada confirmación borra los tokens de su usuario: uno nuevo por
+            # petición (su INSERT cuenta en las consultas de la ruta). La
+            # contraseña nueva es la misma para no romper los logins, y
+            # users[0] no cambia la suya para no cerrar la sesión del
+            # cliente 'user'
+            token = ResetPasswordToken.objects.create(
+                user=users[1 + i % (len(users) - 1)])
+            return {'token': token.key, 'password': 'benchmark'}
+
+        return [
+            ('films', 'anon', 'get', '/api/films/', None),
+            ('films middle page', 'anon', 'get',
+             f'/api/films/?page={middle_page}', None),
+            ('films ordering', 'anon', 'get',
+             '/api/films/?ordering=-average_note', None),
+            ('films year', 'anon', 'get',
+             '/api/films/?year__gte=2000&year__lte=2010', None),
+            ('films genres', 'anon', 'get',
+             f'/api/films/?genres={genre.pk}', None),
+            ('films search', 'anon', 'get', '/api/films/?search=amor', None),
+            ('films facets', 'anon', 'get',
+             f'/api/films/?facets=genres,decade,rating&genres={genre.pk}'
+             '&decade=1990', None),
+            ('films cursor', 'anon', 'get',
+             '/api/films/?cursor=&ordering=-average_note', None),
+            ('films ndjson', 'anon', 'get',
+             f'/api/films/?format=ndjson&genres={genre.pk}', None),
+            ('film detail', 'anon', 'get', film_url, None),
+            ('genres', 'anon', 'get', '/api/genres/', None),
+            ('genre detail', 'anon', 'get', f'/api/genres/{genre.slug}/',
+             None),
+            ('genre films', 'anon', 'get',
+             f'/api/genres/{genre.slug}/films/?ordering=-average_note', None),
+            ('genres ndjson', 'anon', 'get', '/api/genres/?format=ndjson',
+             None),
+            ('genre films ndjson', 'anon', 'get',
+             f'/api/genres/{genre.slug}/films/?format=ndjson', None),
+            ('rankings top_rated', 'anon', 'get',
+             '/api/rankings/top_rated/', None),
+            ('rankings trending_week', 'anon', 'get',
+             '/api/rankings/trending_week/', None),
+            ('recommendations', 'user', 'get', '/api/recommendations/', None),
+            ('userfilms', 'user', 'get', '/api/userfilms/', None),
+            ('userfilms filter', 'user', 'get',
+             '/api/userfilms/?state=1&favorite=true', None),
+            ('userfilms ndjson', 'user', 'get',
+             '/api/userfilms/?format=ndjson', None),
+            ('userfilms POST', 'user', 'post', '/api/userfilms/', rating),
+            ('userfilms batch POST', 'user', 'post', '/api/userfilms/batch/',
+             batch),
+            ('auth login', None, 'post', '/api/auth/login/', login),
+            ('auth signup', None, 'post', '/api/auth/signup/', signup),
+            ('auth logout', None, 'post', '/api/auth/logout/', None),
+            ('auth reset', None, 'post', '/api/auth/reset/', login),
+            ('auth reset validate', None, 'post',
+             '/api/auth/reset/validate_token/', reset_token),
+            ('auth reset confirm', None, 'post',
+             '/api/auth/reset/confirm/', reset_token),
+            ('profile', 'user', 'get', '/api/user/profile/', None),
+            ('profile PATCH', 'user', 'patch', '/api/user/profile/', profile),
+            ('async films', 'async', 'get', '/api/async/films/', None),
+            ('async film detail', 'async', 'get',
+             lambda i: '/api/async' + film_url(i)[4:], None),
+            ('async genres', 'async', 'get', '/api/async/genres/', None),
+            ('async genre detail', 'async', 'get',
+             f'/api/async/genres/{genre.slug}/', None),
+            ('async userfilms', 'async', 'get', '/api/async/userfilms/',
+             None),
+            ('metrics', 'anon', 'get', '/metrics', None),
+        ]
+
+    def request(self, client, method, url, data, i):
+        # Una respuesta de error no mide la ruta: se aborta
+        client = client or Client()
+        call = getattr(client, method)
+        if isinstance(client, AsyncClient):
+            call = async_to_sync(call)
+        url = url(i) if callable(url) else url
+        if method == 'get':
+            response = call(url)
+        else:
+            data = data(i) if callable(data) else data
+            response = call(url, data or {}, content_type='application/json')
+        if not 200 <= response.status_code < 300:
+            raise CommandError(
+                f'{method.upper()} {url} devolvió {response.status_code}')
+        if response.streaming:
+            # NDJSON: el listado se lee y serializa al recorrer el cuerpo
+            b''.join(response.streaming_content)
+        return response
+
+    def run_case(self, client, method, url, data, requests):
+        self.request(client, method, url, data, 0)  # calentamiento
+        latencies = []
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for i in range(1, requests + 1):
+                request_start = time.perf_counter()
+                self.request(client, method, url, data, i)
+                latencies.append((time.perf_counter() - request_start) * 1000)
+            elapsed = time.perf_counter() - start
+        latencies.sort()
+
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+        return {
+            'rps': requests / elapsed,
+            'p50': statistics.median(latencies),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'queries': len(queries.captured_queries) / requests,
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:24} {result['rps']:8.1f} req/s  "
+            f"p50 {result['p50']:6.1f}ms  p95 {result['p95']:6.1f}ms  "
+            f"p99 {result['p99']:6.1f}ms  {result['queries']:5.1f} consultas")
+
+    def compare(self, results, baseline, tolerance):
+        # Una consulta más por petición es una regresión (los lotes varían
+        # algo según el orden de las películas); la latencia admite la
+        # tolerancia
+        failures = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if result['queries'] >= previous['queries'] + 1:
+                failures.append(
+                    f"{name}: {previous['queries']:g} -> "
+                    f"{result['queries']:g} consultas")
+            if result['p50'] > previous['p50'] * (1 + tolerance):
+                failures.append(
+                    f"{name}: p50 {previous['p50']:.1f}ms -> "
+                    f"{result['p50']:.1f}ms")
+        return failures
@@ -0,0 +1,150 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from films.models import Film, FilmGenre
+
+
+class Command(BaseCommand):
+    help = ('Compara el rendimiento (peticiones/s y latencias p50/p99) de '
+            'los endpoints síncronos servidos por WSGI con sus variantes '
+            'asíncronas servidas por ASGI, con clientes concurrentes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--username',
+                            help='Usuario para medir también /userfilms/')
+
+    def handle(self, *args, **options):
+        # Las aplicaciones se importan aquí para que carguen la configuración
+        from server.asgi import application as asgi_application
+        from server.wsgi import application as wsgi_application
+
+        film = Film.objects.first()
+        genre = FilmGenre.objects.first()
+        if film is None or genre is None:
+            raise CommandError('El catálogo está vacío')
+
+        paths = [
+            '/api/{}films/',
+            '/api/{}films/?ordering=-average_note&page=2',
+            '/api/{}films/?search=amor',
+            f'/api/{{}}films/{film.pk}/',
+            '/api/{}genres/',
+            f'/api/{{}}genres/{genre.slug}/',
+        ]
+        cookie = ''
+        if options['username']:
+            cookie = self.session_cookie(options['username'])
+            paths.append('/api/{}userfilms/')
+
+        # Sin caché de catálogo ni límites: las variantes asíncronas no los
+        # usan y lo que se compara es la espera a la base de datos
+        dummy_cache = {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        with override_settings(
+                CACHES={**settings.CACHES, 'benchmark': dummy_cache},
+                CATALOG_CACHE='benchmark', THROTTLE_ENABLED=False):
+            for path in paths:
+                wsgi = self.run_wsgi(
+                    wsgi_application, path.format(''), cookie, options)
+                asgi = asyncio.run(self.run_asgi(
+                    asgi_application, path.format('async/'), cookie, options))
+                self.stdout.write(path.format(''))
+                self.report('WSGI', *wsgi)
+                self.report('ASGI', *asgi)
+
+    def session_cookie(self, username):
+        try:
+            user = get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No existe el usuario {username}')
+        session = SessionStore()
+        session['_auth_user_id'] = str(user.pk)
+        session['_auth_user_backend'] = \
+            'django.contrib.auth.backends.ModelBackend'
+        session['_auth_user_hash'] = user.get_session_auth_hash()
+        session.create()
+        return f'sessionid={session.session_key}'
+
+    def run_wsgi(self, application, url, cookie, options):
+        path, _, query = url.partition('?')
+
+        def request():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path,
+                'QUERY_STRING': query, 'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'HTTP_COOKIE': cookie, 'wsgi.input': BytesIO(),
+                'wsgi.url_scheme': 'http', 'wsgi.errors': self.stderr,
+                'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False, 'wsgi.version': (1, 0),
+            }
+            statuses = []
+            start = time.perf_counter()
+            response = application(
+                environ, lambda status, headers: statuses.append(status))
+            b''.join(response)
+            response.close()
+            return time.perf_counter() - start, int(statuses[0][:3])
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(
+                lambda _: request(), range(options['requests'])))
+        return results, time.perf_counter() - start
+
+    async def run_asgi(self, application, url, cookie, options):
+        parts = urlsplit(url)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': parts.path,
+            'raw_path': parts.path.encode(), 'root_path': '',
+            'query_string': parts.query.encode(),
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def request():
+            messages = []
+            inbox = [{'type': 'http.request', 'body': b'',
+                      'more_body': False}]
+            disconnected = asyncio.Event()
+
+            async def receive():
+                # Tras el cuerpo el servidor espera hasta la desconexión
+                if inbox:
+                    return inbox.pop()
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+
+            async with semaphore:
+                start = time.perf_counter()
+                await application(dict(scope), receive, send)
+                return time.perf_counter() - start, messages[0]['status']
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(request() for _ in range(options['requests'])))
+        return results, time.perf_counter() - start
+
+    def report(self, label, results, elapsed):
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(1 for _, status in results if status != 200)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'  {label}: {len(results) / elapsed:8.1f} req/s  '
+            f'p50 {statistics.median(latencies):7.1f}ms  p99 {p99:7.1f}ms'
+            + (f'  ({errors} errores)' if errors else ''))
@@ -0,0 +1,66 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from films.models import FilmUser
+from films.recommendations import (import_numpy, rebuild_similarities,
+                                   recommended_films,
+                                   refresh_film_similarities)
+from films.synthetic import (create_films, create_genres, create_ratings,
+                             create_users)
+
+
+class Command(BaseCommand):
+    help = ('Mide el cálculo de las similitudes y la latencia de las '
+            'recomendaciones sobre un catálogo sintético (se descarta al '
+            'terminar)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--films', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--ratings', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=200)
+
+    def handle(self, *args, **options):
+        try:
+            import_numpy()
+        except ImportError as error:
+            raise CommandError(error)
+
+        with transaction.atomic():
+            start = time.perf_counter()
+            films = create_films(options['films'], create_genres())
+            users = create_users(options['users'])
+            create_ratings(options['ratings'], users, films)
+            self.stdout.write(
+                f"{options['ratings']} notas generadas en "
+                f'{time.perf_counter() - start:.1f}s')
+
+            start = time.perf_counter()
+            count = rebuild_similarities()
+            self.stdout.write(
+                f'Cálculo completo: {count} similitudes en '
+                f'{time.perf_counter() - start:.1f}s')
+
+            # La película más popular y una de la cola larga
+            for label, film in (('popular', films[0]), ('cola', films[-1])):
+                start = time.perf_counter()
+                refresh_film_similarities(film.pk)
+                self.stdout.write(
+                    f'Actualización incremental ({label}, '
+                    f'{FilmUser.objects.filter(film=film).count()} notas): '
+                    f'{(time.perf_counter() - start) * 1000:.0f}ms')
+
+            rng = random.Random(0)
+            times = []
+            for user in rng.sample(users, min(options['queries'], len(users))):
+                start = time.perf_counter()
+                recommended_films(user, 20)
+                times.append((time.perf_counter() - start) * 1000)
+            times.sort()
+            self.stdout.write(
+                f'Recomendaciones: p50 {statistics.median(times):.1f}ms '
+                f'p99 {times[min(len(times) - 1, int(len(times) * 0.99))]:.1f}ms')
+
+            transaction.set_rollback(True)
@@ -0,0 +1,62 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from films.models import Film
+from films.synthetic import create_films, create_genres
+
+QUERIES = ['amor', 'secreto noche', 'accion', 'ciencia', 'dra', 'corazón',
+           '1985', 'el último dragón']
+
+
+class LegacySearchView:
+    # Configuración de búsqueda anterior de FilmViewSet
+    search_fields = ['title', 'year', 'genres__name']
+
+
+class Command(BaseCommand):
+    help = ('Compara la búsqueda indexada con el SearchFilter de DRF '
+            'sobre un catálogo sintético (se descarta al terminar)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--films', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            start = time.perf_counter()
+            create_films(options['films'], create_genres())
+            self.stdout.write(
+                f"Catálogo de {options['films']} películas generado en "
+                f"{time.perf_counter() - start:.1f}s")
+
+            for query in QUERIES:
+                legacy = self.measure(
+                    lambda: self.legacy_search(query), options['repeat'])
+                indexed = self.measure(
+                    lambda: Film.objects.search(query), options['repeat'])
+                self.stdout.write(
+                    f'{query!r:20} SearchFilter {legacy[0]:8.1f}ms '
+                    f'({legacy[1]} filas)  índice {indexed[0]:8.1f}ms '
+                    f'({indexed[1]} filas)')
+
+            transaction.set_rollback(True)
+
+    def legacy_search(self, query):
+        request = Request(APIRequestFactory().get('/', {'search': query}))
+        return filters.SearchFilter().filter_queryset(
+            request, Film.objects.all(), LegacySearchView())
+
+    def measure(self, build_queryset, repeat):
+        # Mediana del tiempo de una página de 8 resultados más su count
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset = build_queryset()
+            count = queryset.count()
+            list(queryset[:8])
+            times.append((time.perf_counter() - start) * 1000)
+        return statistics.median(times), count
@@ -0,0 +1,76 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from server.renderers import FastJSONRenderer, orjson
+from films.models import Film
+from films.optimizers import optimize_queryset
+from films.serializers import FilmListSerializer, FilmSerializer
+from films.synthetic import create_films, create_genres
+
+# (nombre, serializer, parámetros de la petición)
+CASES = [
+    ('detalle completo', FilmSerializer, {}),
+    ('listado compacto', FilmListSerializer, {}),
+    ('listado + géneros', FilmListSerializer, {'expand': 'genres'}),
+    ('fields=id,title', FilmListSerializer, {'fields': 'id,title'}),
+]
+
+
+class Command(BaseCommand):
+    help = ('Mide el coste de serializar y renderizar listados de películas '
+            'con cada representación y renderer sobre un catálogo sintético '
+            '(se descarta al terminar)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--films', type=int, nargs='+',
+                            default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        renderers = [('json', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('orjson', FastJSONRenderer()))
+        else:
+            self.stdout.write('orjson no está instalado: sólo JSONRenderer')
+
+        with transaction.atomic():
+            genres = create_genres()
+            created = 0
+            for count in sorted(options['films']):
+                create_films(count - created, genres, seed=created)
+                created = count
+                self.stdout.write(f'{count} películas')
+                for name, serializer_class, params in CASES:
+                    self.run_case(name, serializer_class, params, count,
+                                  renderers, options['repeat'])
+            transaction.set_rollback(True)
+
+    def run_case(self, name, serializer_class, params, count, renderers,
+                 repeat):
+        request = Request(APIRequestFactory().get('/api/films/', params))
+        context = {'request': request}
+        films = list(optimize_queryset(
+            Film.objects.all(), serializer_class(context=context))[:count])
+
+        # La serialización y el renderizado se miden por separado
+        serialize = self.measure(lambda: serializer_class(
+            films, many=True, context=context).data, repeat)
+        data = serializer_class(films, many=True, context=context).data
+        line = f'  {name:18} serializer {serialize:8.1f}ms'
+        for renderer_name, renderer in renderers:
+            render = self.measure(lambda: renderer.render(data), repeat)
+            line += f'  {renderer_name} {render:7.1f}ms'
+        size = len(renderers[-1][1].render(data)) / 1024
+        self.stdout.write(f'{line}  {size:8.0f}KB')
+
+    def measure(self, function, repeat):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append((time.perf_counter() - start) * 1000)
+        return statistics.median(times)
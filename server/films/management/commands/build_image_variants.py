@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from films.models import Film
+from server.images import generate_image_variants
+
+
+class Command(BaseCommand):
+    help = ('Genera los derivados (tamaños y WebP) de las imágenes ya '
+            'subidas de películas y avatares')
+
+    def handle(self, *args, **options):
+        for model in (Film, get_user_model()):
+            count = 0
+            for pk in model.objects.values_list('pk', flat=True).iterator():
+                generate_image_variants(
+                    model._meta.label, pk, list(model.IMAGE_SIZES))
+                count += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: {count} registros procesados'))
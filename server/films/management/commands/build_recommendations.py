@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from films.recommendations import rebuild_similarities
+
+
+class Command(BaseCommand):
+    help = ('Recalcula desde cero la tabla de películas similares a partir '
+            'de los FilmUser (necesita numpy y scipy)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbors', type=int,
+                            help='Vecinas por película')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            count = rebuild_similarities(options['neighbors'])
+        except ImportError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} similitudes guardadas en '
+            f'{time.perf_counter() - start:.1f}s'))
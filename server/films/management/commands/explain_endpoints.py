@@ -0,0 +1,118 @@
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from films.models import FilmUser
+from films.rankings import RANKINGS, refresh_ranking
+from films.synthetic import (create_films, create_genres, create_ratings,
+                             create_users)
+
+# Tablas que crecen con el catálogo: en ellas no se admiten lecturas completas
+LARGE_TABLES = ['films_film', 'films_filmuser', 'films_filmsearchtoken',
+                'films_film_genres', 'films_filmusertombstone',
+                'films_filmranking']
+
+
+class Command(BaseCommand):
+    help = ('Ejecuta EXPLAIN sobre las consultas de cada endpoint público '
+            'con un catálogo sintético y falla si aparece un escaneo '
+            'secuencial (los datos se descartan al terminar)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--films', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--ratings', type=int, default=50000)
+        parser.add_argument('--verbose-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        self.verbose_plans = options['verbose_plans']
+        failures = []
+        with transaction.atomic():
+            genres = create_genres()
+            films = create_films(options['films'], genres)
+            users = create_users(options['users'])
+            create_ratings(options['ratings'], users, films)
+            # Borrados para que la sincronización lea los tombstones
+            for film_user in FilmUser.objects.filter(user=users[0])[:20]:
+                film_user.delete()
+            for kind in RANKINGS:
+                refresh_ranking(kind)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(users[0])
+            for url in self.get_urls(films[0], genres[0]):
+                failures += self.explain_url(client, url)
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(
+                'Escaneos secuenciales encontrados:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Sin escaneos secuenciales'))
+
+    def get_urls(self, film, genre):
+        since = (timezone.now() - timedelta(days=1)).strftime(
+            '%Y-%m-%dT%H:%M:%SZ')
+        return [
+            '/api/films/',
+            '/api/films/?page=50',
+            '/api/films/?ordering=-year',
+            '/api/films/?ordering=-favorites',
+            '/api/films/?ordering=-average_note',
+            '/api/films/?year__gte=2000&year__lte=2010',
+            f'/api/films/?genres={genre.pk}',
+            '/api/films/?search=amor',
+            '/api/films/?cursor=&ordering=-average_note',
+            f'/api/films/{film.pk}/',
+            '/api/genres/',
+            f'/api/genres/{genre.slug}/',
+            f'/api/genres/{genre.slug}/films/?ordering=-average_note',
+            '/api/rankings/top_rated/',
+            '/api/userfilms/',
+            '/api/userfilms/?state=1&favorite=true',
+            f'/api/userfilms/?since={since}',
+        ]
+
+    def explain_url(self, client, url):
+        caches[settings.CATALOG_CACHE].clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        if response.status_code != 200:
+            return [f'{url}: HTTP {response.status_code}']
+
+        failures = []
+        for query in queries.captured_queries:
+            plan = self.explain(query['sql'])
+            if self.verbose_plans:
+                self.stdout.write(f"{url}\n  {query['sql']}\n  {plan}")
+            for table in self.sequential_scans(query['sql'], plan):
+                failures.append(f"{url}: {table}\n  {query['sql']}")
+        self.stdout.write(
+            f'{url}: {len(queries.captured_queries)} consultas')
+        return failures
+
+    def explain(self, sql):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' \
+            else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return '\n'.join(' '.join(map(str, row)) for row in cursor.fetchall())
+
+    def sequential_scans(self, sql, plan):
+        if connection.vendor == 'sqlite':
+            pattern = r'SCAN (\w+)\b(?! USING)'
+        else:
+            pattern = r'Seq Scan on (\w+)'
+        # Las subconsultas de Django usan alias (U0, T1...) para las tablas
+        aliases = dict((alias, table) for table, alias
+                       in re.findall(r'"(\w+)" ([A-Z]\d+)\b', sql))
+        tables = [aliases.get(name, name)
+                  for name in re.findall(pattern, plan)]
+        return [table for table in tables if table in LARGE_TABLES]
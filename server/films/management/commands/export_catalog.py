@@ -0,0 +1,31 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from films.catalog import EXPORTERS, FORMATS, write_rows
+
+
+class Command(BaseCommand):
+    help = ('Exporta géneros, películas (con sus géneros) y FilmUser a un '
+            'directorio, un fichero NDJSON o CSV por sección, recorriendo '
+            'las tablas por bloques con memoria constante')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--sections', nargs='+', choices=list(EXPORTERS),
+                            default=list(EXPORTERS))
+
+    def handle(self, *args, **options):
+        os.makedirs(options['directory'], exist_ok=True)
+        for section in options['sections']:
+            start = time.perf_counter()
+            path = os.path.join(
+                options['directory'], f"{section}.{options['format']}")
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                count = write_rows(
+                    file, options['format'], section,
+                    EXPORTERS[section](options['chunk_size']))
+            self.stdout.write(
+                f'{section}: {count} filas en {path} '
+                f'({time.perf_counter() - start:.1f}s)')
@@ -0,0 +1,76 @@
+import json
+import os
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from films.cache import bump_versions
+from films.catalog import FORMATS, IMPORTERS, batched, read_rows
+from films.models import FilmGenre, FilmUser, UserStats
+
+
+class Command(BaseCommand):
+    help = ('Importa un directorio generado por export_catalog en lotes con '
+            'bulk_create. Tras cada lote se guarda un punto de control y al '
+            'repetir el comando se continúa desde el último')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignorar el punto de control')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f'No existe el directorio {directory}')
+        checkpoint_path = os.path.join(directory, 'checkpoint.json')
+        checkpoint = {}
+        if os.path.exists(checkpoint_path) and not options['restart']:
+            with open(checkpoint_path) as file:
+                checkpoint = json.load(file)
+            self.stdout.write(f'Continuando desde {checkpoint}')
+
+        for section, importer in IMPORTERS.items():
+            path, format = self.find_file(directory, section)
+            if path is None:
+                continue
+            start = time.perf_counter()
+            done = checkpoint.get(section, 0)
+            skipped = 0
+            with open(path, newline='', encoding='utf-8') as file:
+                rows = islice(read_rows(file, format, section), done, None)
+                for batch in batched(rows, options['batch_size']):
+                    with transaction.atomic():
+                        skipped += importer(batch)
+                    done += len(batch)
+                    checkpoint[section] = done
+                    self.save_checkpoint(checkpoint_path, checkpoint)
+            self.stdout.write(
+                f'{section}: {done} filas ({skipped} descartadas) en '
+                f'{time.perf_counter() - start:.1f}s')
+
+        FilmGenre.objects.refresh_films_count()
+        if 'filmusers' in checkpoint:
+            # bulk_create no emite señales: contadores de los usuarios
+            UserStats.objects.rebuild(FilmUser.objects.values_list(
+                'user', flat=True).distinct().order_by().iterator())
+        bump_versions('films', 'genres')
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            'Catálogo importado. Las clasificaciones y recomendaciones se '
+            'actualizan con refresh_rankings y build_recommendations'))
+
+    def find_file(self, directory, section):
+        for format in FORMATS:
+            path = os.path.join(directory, f'{section}.{format}')
+            if os.path.exists(path):
+                return path, format
+        return None, None
+
+    def save_checkpoint(self, path, checkpoint):
+        # Escritura atómica: un corte a mitad no deja el fichero a medias
+        with open(path + '.tmp', 'w') as file:
+            json.dump(checkpoint, file)
+        os.replace(path + '.tmp', path)
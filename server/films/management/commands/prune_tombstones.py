@@ -0,0 +1,27 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from films.models import FilmUserTombstone
+
+
+class Command(BaseCommand):
+    help = ('Borra los registros de FilmUser borrados más antiguos que '
+            'SYNC_TOMBSTONE_DAYS: los clientes con un token anterior deben '
+            'sincronizar de nuevo desde cero')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=settings.SYNC_TOMBSTONE_DAYS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        # Por lotes para no bloquear la tabla con un único DELETE enorme
+        before = timezone.now() - timedelta(days=options['days'])
+        old = FilmUserTombstone.objects.filter(deleted_at__lt=before)
+        deleted = 0
+        while pks := list(old.values_list('pk', flat=True)[
+                :options['batch_size']]):
+            deleted += FilmUserTombstone.objects.filter(pk__in=pks).delete()[0]
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} borrados anteriores a {before:%Y-%m-%d} eliminados'))
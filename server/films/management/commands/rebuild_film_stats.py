@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from films.models import Film
+
+
+class Command(BaseCommand):
+    help = ('Recalcula desde cero los contadores de favoritos y notas '
+            'de las películas a partir de los FilmUser')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Sólo comprueba los contadores sin modificarlos')
+
+    def handle(self, *args, **options):
+        verify = options['verify']
+        stale = Film.objects.all().rebuild_stats(commit=not verify)
+
+        for film in stale:
+            self.stdout.write(
+                f'{film.pk}: favoritos={film.favorites} '
+                f'notas={film.notes_count} suma={film.notes_sum} '
+                f'media={film.average_note}')
+
+        if verify and stale:
+            raise CommandError(
+                f'{len(stale)} películas con contadores desincronizados')
+
+        action = 'desincronizadas' if verify else 'corregidas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(stale)} películas {action}'))
@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from films.models import UserStats
+
+
+class Command(BaseCommand):
+    help = ('Recalcula desde cero los contadores de la lista de cada usuario '
+            'y su desglose por género a partir de los FilmUser')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk').values_list(
+            'pk', flat=True)
+        UserStats.objects.rebuild(users.iterator(), options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Contadores de {users.count()} usuarios recalculados'))
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from films.rankings import RANKINGS, refresh_ranking
+
+
+class Command(BaseCommand):
+    help = ('Recalcula las clasificaciones precalculadas (mejor valoradas y '
+            'tendencias) escribiendo sólo las posiciones que cambian')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=RANKINGS, action='append',
+                            help='Clasificación a recalcular (todas por '
+                                 'defecto)')
+        parser.add_argument('--interval', type=int,
+                            help='Repite el cálculo cada tantos segundos')
+
+    def handle(self, *args, **options):
+        kinds = options['kind'] or RANKINGS
+        while True:
+            for kind in kinds:
+                start = time.perf_counter()
+                changes = refresh_ranking(kind)
+                self.stdout.write(
+                    f'{kind}: {changes} posiciones actualizadas en '
+                    f'{(time.perf_counter() - start) * 1000:.0f}ms')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
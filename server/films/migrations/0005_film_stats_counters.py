@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:08
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+
+def populate_counters(apps, schema_editor):
+    Film = apps.get_model('films', 'Film')
+    films = Film.objects.annotate(
+        real_favorites=Count('filmuser', filter=Q(filmuser__favorite=True)),
+        real_notes_count=Count('filmuser__note'),
+        real_notes_sum=Coalesce(Sum('filmuser__note'), 0)).annotate(
+            # La misma expresión que films.models.average_note_expression:
+            # round() de Python no redondea igual los empates
+            real_average_note=Coalesce(
+                Round(Cast(F('real_notes_sum'), FloatField())
+                      / NullIf(F('real_notes_count'), 0), 2),
+                0.0, output_field=FloatField()))
+    for film in films:
+        film.favorites = film.real_favorites
+        film.notes_count = film.real_notes_count
+        film.notes_sum = film.real_notes_sum
+        film.average_note = film.real_average_note
+        film.save(update_fields=[
+            'favorites', 'notes_count', 'notes_sum', 'average_note'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('films', '0004_auto_20210319_1856'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='film',
+            name='notes_count',
+            field=models.IntegerField(default=0, verbose_name='número de notas'),
+        ),
+        migrations.AddField(
+            model_name='film',
+            name='notes_sum',
+            field=models.IntegerField(default=0, verbose_name='suma de notas'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
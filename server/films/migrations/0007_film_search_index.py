@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from films.search import film_tokens
+
+
+def build_search_index(apps, schema_editor):
+    Film = apps.get_model('films', 'Film')
+    FilmSearchToken = apps.get_model('films', 'FilmSearchToken')
+    tokens = []
+    for film in Film.objects.prefetch_related('genres'):
+        names = [genre.name for genre in film.genres.all()]
+        for token, weight in film_tokens(
+                film.title, film.year, film.review_short, names).items():
+            tokens.append(
+                FilmSearchToken(film=film, token=token, weight=weight))
+    FilmSearchToken.objects.bulk_create(tokens, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('films', '0006_filmuser_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmSearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=50)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('film', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='films.film')),
+            ],
+            options={
+                'unique_together': {('token', 'film')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
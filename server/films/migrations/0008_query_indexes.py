@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('films', '0007_film_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='film',
+            index=models.Index(fields=['title', 'id'], name='films_film_title_018a96_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='film',
+            index=models.Index(fields=['year', 'id'], name='films_film_year_a197bd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='film',
+            index=models.Index(fields=['favorites', 'id'], name='films_film_favorit_d25777_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='film',
+            index=models.Index(fields=['average_note', 'id'], name='films_film_average_c54dd2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filmuser',
+            index=models.Index(condition=models.Q(('favorite', True)), fields=['film'], name='filmuser_film_favorite_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filmuser',
+            index=models.Index(condition=models.Q(('note__isnull', False)), fields=['film', 'note'], name='filmuser_film_note_idx'),
+        ),
+    ]
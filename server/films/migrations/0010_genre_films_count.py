@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:28
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_films_count(apps, schema_editor):
+    FilmGenre = apps.get_model('films', 'FilmGenre')
+    for genre in FilmGenre.objects.annotate(count=Count('film_genres')):
+        genre.films_count = genre.count
+        genre.save(update_fields=['films_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('films', '0009_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filmgenre',
+            name='films_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='número de películas'),
+        ),
+        migrations.RunPython(populate_films_count, migrations.RunPython.noop),
+    ]
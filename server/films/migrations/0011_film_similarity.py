@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('films', '0010_genre_films_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmSimilarity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('film', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='films.film')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='films.film')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['neighbor'], name='films_films_neighbo_b456d4_idx')],
+                'unique_together': {('film', 'neighbor')},
+            },
+        ),
+    ]
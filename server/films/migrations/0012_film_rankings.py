@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('films', '0011_film_similarity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmRanking',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('position', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='filmuser',
+            index=models.Index(fields=['updated_at', 'film'], name='films_filmu_updated_45d604_idx'),
+        ),
+        migrations.AddField(
+            model_name='filmranking',
+            name='film',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='films.film'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='filmranking',
+            unique_together={('kind', 'position')},
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_user_stats(apps, schema_editor):
+    FilmUser = apps.get_model('films', 'FilmUser')
+    UserStats = apps.get_model('films', 'UserStats')
+    aggregates = {
+        'watched': Count('pk', filter=Q(state=1)),
+        'want_to_watch': Count('pk', filter=Q(state=2)),
+        'favorites': Count('pk', filter=Q(favorite=True)),
+        'notes_count': Count('note'),
+        'notes_sum': Coalesce(Sum('note'), 0),
+    }
+    rows = FilmUser.objects.order_by()
+    totals = rows.values('user').annotate(**aggregates)
+    genres = rows.filter(film__genres__isnull=False).values(
+        'user', genre=F('film__genres')).annotate(**aggregates)
+    UserStats.objects.bulk_create([
+        UserStats(user_id=row.pop('user'), genre_id=row.pop('genre', None),
+                  **row)
+        for row in [*totals, *genres]], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('films', '0012_film_rankings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watched', models.IntegerField(default=0)),
+                ('want_to_watch', models.IntegerField(default=0)),
+                ('favorites', models.IntegerField(default=0)),
+                ('notes_count', models.IntegerField(default=0)),
+                ('notes_sum', models.IntegerField(default=0)),
+                ('genre', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='films.filmgenre')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='film_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'genre'), name='userstats_user_genre_unique'), models.UniqueConstraint(condition=models.Q(('genre__isnull', True)), fields=('user',), name='userstats_user_total_unique')],
+            },
+        ),
+        migrations.RunPython(populate_user_stats, migrations.RunPython.noop),
+    ]
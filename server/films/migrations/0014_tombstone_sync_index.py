@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('films', '0013_user_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='filmusertombstone',
+            name='films_filmu_user_id_0f7f3f_idx',
+        ),
+        migrations.AddIndex(
+            model_name='filmusertombstone',
+            index=models.Index(fields=['user', 'deleted_at', 'film_id'], name='filmusertombstone_sync_idx'),
+        ),
+    ]
@@ -1,10 +1,109 @@
 import uuid
-from django.db import models
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import models, transaction
 from django.utils.text import slugify
+from jobs.queue import enqueue, enqueue_many
+from server.images import remember_image_names, update_image_variants
 from django.conf import settings
 from django.core.validators import MaxValueValidator
-from django.db.models import Sum
-from django.db.models.signals import post_save
+from functools import reduce
+from itertools import islice
+from operator import or_
+from django.db.models import (Case, Count, F, FloatField, Max, OuterRef, Q,
+                              Subquery, Sum, When)
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from .cache import (invalidate_film, invalidate_film_genres,
+                    invalidate_film_stats, invalidate_genre)
+from .search import film_tokens, prefix_range, query_terms
+
+
+def average_note_expression(notes_count, notes_sum):
+    # Media redondeada a 2 decimales, 0 si la película no tiene notas
+    return Coalesce(
+        Round(Cast(notes_sum, FloatField()) / NullIf(notes_count, 0), 2),
+        0.0, output_field=FloatField())
+
+
+class FilmQuerySet(models.QuerySet):
+
+    def apply_stats_delta(self, favorites=0, notes_count=0, notes_sum=0):
+        # Actualización atómica de los contadores sin recorrer los FilmUser
+        count = F('notes_count') + notes_count
+        total = F('notes_sum') + notes_sum
+        return self.update(
+            favorites=F('favorites') + favorites,
+            notes_count=count,
+            notes_sum=total,
+            average_note=average_note_expression(count, total))
+
+    def with_real_stats(self):
+        # Contadores calculados desde cero a partir de los FilmUser
+        return self.annotate(
+            real_favorites=Count(
+                'filmuser', filter=Q(filmuser__favorite=True)),
+            real_notes_count=Count('filmuser__note'),
+            real_notes_sum=Coalesce(Sum('filmuser__note'), 0)).annotate(
+                # La misma expresión que los deltas: el redondeo de la base
+                # de datos no coincide con round() en los empates
+                real_average_note=average_note_expression(
+                    F('real_notes_count'), F('real_notes_sum')))
+
+    def rebuild_stats(self, commit=True):
+        # Devuelve las películas cuyos contadores estaban desincronizados
+        stale = []
+        queryset = self.with_real_stats().only(
+            'id', 'favorites', 'notes_count', 'notes_sum', 'average_note')
+        for film in queryset.iterator(chunk_size=2000):
+            stats = (film.real_favorites, film.real_notes_count,
+                     film.real_notes_sum, film.real_average_note)
+            if stats != (film.favorites, film.notes_count,
+                         film.notes_sum, film.average_note):
+                (film.favorites, film.notes_count,
+                 film.notes_sum, film.average_note) = stats
+                stale.append(film)
+        if commit and stale:
+            self.model.objects.bulk_update(
+                stale, self.model.STATS_FIELDS, batch_size=500)
+            invalidate_film_stats(*[film.pk for film in stale])
+        return stale
+
+    def search(self, query):
+        # Películas que contienen todos los términos (como prefijo) de la
+        # búsqueda, ordenadas por relevancia
+        terms = query_terms(query)
+        if not terms:
+            return self
+        matches = [Q(token__gte=start, token__lt=end)
+                   for start, end in map(prefix_range, terms)]
+        ranked = FilmSearchToken.objects.filter(reduce(or_, matches)).values(
+            'film').annotate(
+                # Los tokens exactos puntúan el doble que los prefijos
+                search_rank=Sum(Case(
+                    When(token__in=terms, then=F('weight') * 2),
+                    default=F('weight'), output_field=models.IntegerField())),
+                **{f'term_{i}': Max(Case(When(match, then=1), default=0))
+                   for i, match in enumerate(matches)}
+        ).filter(**{f'term_{i}': 1 for i in range(len(matches))})
+        return self.filter(pk__in=ranked.values('film')).annotate(
+            search_rank=ranked.filter(film=models.OuterRef('pk')).values(
+                'search_rank')).order_by('-search_rank', 'title')
+
+    def reindex_search(self, chunk_size=2000):
+        # Regenera los tokens de búsqueda de las películas del queryset
+        films = self.only('id', 'title', 'year', 'review_short') \
+            .prefetch_related(models.Prefetch(
+                'genres', queryset=FilmGenre.objects.only('id', 'name')))
+        batch = []
+        for film in films.iterator(chunk_size=chunk_size):
+            batch.append(film)
+            if len(batch) == chunk_size:
+                FilmSearchToken.objects.index(batch)
+                batch = []
+        if batch:
+            FilmSearchToken.objects.index(batch)
 
 
 class Film(models.Model):
@@ -36,20 +135,62 @@ class Film(models.Model):
     average_note = models.FloatField(
         default=0.0, verbose_name="nota media",
         validators=[MaxValueValidator(10.0)])
+    notes_count = models.IntegerField(
+        default=0, verbose_name="número de notas")
+    notes_sum = models.IntegerField(
+        default=0, verbose_name="suma de notas")
+    image_variants = models.JSONField(
+        default=dict, blank=True, editable=False)  # ver server/images.py
+
+    IMAGE_SIZES = {
+        'image_thumbnail': [160, 320, 640],
+        'image_wallpaper': [640, 1280, 1920],
+    }
+    STATS_FIELDS = ['favorites', 'notes_count', 'notes_sum', 'average_note']
+
+    objects = FilmQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Película"
         ordering = ['title']
+        # Un índice por cada ordenación pública con el uuid como desempate
+        # para la paginación por cursor
+        indexes = [
+            models.Index(fields=['title', 'id']),
+            models.Index(fields=['year', 'id']),
+            models.Index(fields=['favorites', 'id']),
+            models.Index(fields=['average_note', 'id']),
+        ]
 
     def __str__(self):
         return f'{self.title} ({self.year})'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        remember_image_names(instance, field_names)
+        return instance
+
+
+class FilmGenreQuerySet(models.QuerySet):
+
+    def refresh_films_count(self):
+        # Recalcula el contador desnormalizado desde la tabla intermedia
+        through = Film.genres.through
+        count = through.objects.filter(filmgenre=OuterRef('pk')) \
+            .values('filmgenre').annotate(count=Count('*')).values('count')
+        return self.update(films_count=Coalesce(Subquery(count), 0))
+
 
 class FilmGenre(models.Model):
     name = models.CharField(
         max_length=50, verbose_name="Nombre", unique=True)
     slug = models.SlugField(
         unique=True)
+    films_count = models.IntegerField(
+        default=0, editable=False, verbose_name="número de películas")
+
+    objects = FilmGenreQuerySet.as_manager()
 
     class Meta:
         verbose_name = "género"
@@ -63,6 +204,33 @@ class FilmGenre(models.Model):
         super(FilmGenre, self).save(*args, **kwargs)
 
 
+class FilmSearchTokenManager(models.Manager):
+
+    def index(self, films):
+        # Sustituye los tokens de un lote de películas con genres precargados
+        self.filter(film__in=films).delete()
+        self.bulk_create([
+            FilmSearchToken(film=film, token=token, weight=weight)
+            for film in films
+            for token, weight in film_tokens(
+                film.title, film.year, film.review_short,
+                [genre.name for genre in film.genres.all()]).items()
+        ], batch_size=1000)
+
+
+class FilmSearchToken(models.Model):
+    # Índice invertido de búsqueda: un token normalizado por película
+    film = models.ForeignKey(
+        Film, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=50)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    objects = FilmSearchTokenManager()
+
+    class Meta:
+        unique_together = ['token', 'film']
+
+
 class FilmUser(models.Model):
 
     STATUS_CHOICES = (
@@ -80,25 +248,499 @@ class FilmUser(models.Model):
     note = models.PositiveSmallIntegerField(
         null=True, validators=[MaxValueValidator(10)])
     review = models.TextField(null=True)
+    updated_at = models.DateTimeField(
+        auto_now=True)  # Para la sincronización incremental
 
     class Meta:
         unique_together = ['film', 'user']
         ordering = ['film__title']
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            # Actividad reciente para las tendencias (ver rankings.py)
+            models.Index(fields=['updated_at', 'film']),
+            # Índices parciales para recalcular las estadísticas de la película
+            models.Index(fields=['film'], condition=Q(favorite=True),
+                         name='filmuser_film_favorite_idx'),
+            models.Index(fields=['film', 'note'],
+                         condition=Q(note__isnull=False),
+                         name='filmuser_film_note_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardamos el estado original para calcular los deltas de estadísticas
+        if 'favorite' in field_names and 'note' in field_names:
+            instance._stats_snapshot = instance.stats_values()
+            if 'state' in field_names:
+                instance._user_stats_snapshot = instance.user_stats_values()
+        return instance
+
+    def stats_values(self):
+        # Normalizamos los valores tal y como se guardan en la base de datos
+        favorite = self._meta.get_field('favorite').to_python(self.favorite)
+        note = self._meta.get_field('note').to_python(self.note)
+        return favorite, note
+
+    def user_stats_values(self):
+        state = self._meta.get_field('state').to_python(self.state)
+        return (state, *self.stats_values())
+
+
+class FilmUserTombstone(models.Model):
+    # Registro de los FilmUser borrados para la sincronización incremental
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE)
+    film_id = models.UUIDField()
+    deleted_at = models.DateTimeField(
+        auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Cubre la consulta de la sincronización sin leer la tabla
+            models.Index(fields=['user', 'deleted_at', 'film_id'],
+                         name='filmusertombstone_sync_idx'),
+        ]
+
+
+class FilmSimilarity(models.Model):
+    # Vecinas más parecidas de cada película (ver recommendations.py)
+    film = models.ForeignKey(
+        Film, on_delete=models.CASCADE, related_name='similarities')
+    neighbor = models.ForeignKey(
+        Film, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ['film', 'neighbor']
+        indexes = [
+            models.Index(fields=['neighbor']),
+        ]
+
+
+class FilmRanking(models.Model):
+    # Clasificaciones precalculadas (ver rankings.py)
+    kind = models.CharField(max_length=20)
+    position = models.PositiveIntegerField()
+    film = models.ForeignKey(
+        Film, on_delete=models.CASCADE, related_name='rankings')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ['kind', 'position']
+
+
+def film_genre_ids(film_id):
+    return list(Film.genres.through.objects.filter(
+        film_id=film_id).values_list('filmgenre_id', flat=True))
+
+
+def user_stats_aggregates():
+    return {
+        'watched': Count('pk', filter=Q(state=1)),
+        'want_to_watch': Count('pk', filter=Q(state=2)),
+        'favorites': Count('pk', filter=Q(favorite=True)),
+        'notes_count': Count('note'),
+        'notes_sum': Coalesce(Sum('note'), 0),
+    }
+
+
+class UserStatsManager(models.Manager):
+
+    def apply_delta(self, user_id, genre_ids, delta):
+        # Suma el delta al total y a los géneros de la película; las filas
+        # que faltan se crean a cero y reciben el delta en un segundo update
+        updates = {field: F(field) + value
+                   for field, value in delta.items() if value}
+        if not updates:
+            return
+        rows = self.filter(Q(genre__isnull=True) | Q(genre__in=genre_ids),
+                           user=user_id)
+        if rows.update(**updates) == len(genre_ids) + 1:
+            return
+        existing = set(rows.values_list('genre', flat=True))
+        missing = [genre for genre in [None, *genre_ids]
+                   if genre not in existing]
+        self.bulk_create([UserStats(user_id=user_id, genre_id=genre)
+                          for genre in missing], ignore_conflicts=True)
+        missing_rows = self.filter(user=user_id, genre__in=[
+            genre for genre in missing if genre is not None])
+        if None in missing:
+            missing_rows |= self.filter(user=user_id, genre__isnull=True)
+        missing_rows.update(**updates)
+
+    def rebuild(self, user_ids, chunk_size=500):
+        # Recalcula desde cero los contadores de los usuarios por bloques
+        user_ids = iter(user_ids)
+        while chunk := list(islice(user_ids, chunk_size)):
+            rows = FilmUser.objects.filter(user__in=chunk).order_by()
+            totals = rows.values('user').annotate(**user_stats_aggregates())
+            genres = rows.filter(film__genres__isnull=False).values(
+                'user', genre=F('film__genres')).annotate(
+                    **user_stats_aggregates())
+            with transaction.atomic():
+                self.filter(user__in=chunk).delete()
+                self.bulk_create([
+                    UserStats(user_id=row.pop('user'),
+                              genre_id=row.pop('genre', None), **row)
+                    for row in [*totals, *genres]], batch_size=1000)
+
+    def summary(self, user):
+        # Totales y desglose por género del usuario en una sola consulta
+        rows = self.filter(user=user).select_related('genre').order_by(
+            'genre__name')
+        summary = UserStats().values()
+        summary['genres'] = []
+        for row in rows:
+            if row.genre is None:
+                summary.update(row.values())
+            elif any(getattr(row, field) for field in UserStats.FIELDS):
+                summary['genres'].append(
+                    {'slug': row.genre.slug, 'name': row.genre.name,
+                     **row.values()})
+        return summary
+
+
+class UserStats(models.Model):
+    # Contadores de la lista de cada usuario mantenidos con cada FilmUser:
+    # sin género el total y con género el desglose
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        related_name='film_stats')
+    genre = models.ForeignKey(
+        FilmGenre, on_delete=models.CASCADE, null=True, related_name='+')
+    watched = models.IntegerField(default=0)
+    want_to_watch = models.IntegerField(default=0)
+    favorites = models.IntegerField(default=0)
+    notes_count = models.IntegerField(default=0)
+    notes_sum = models.IntegerField(default=0)
+
+    objects = UserStatsManager()
+
+    FIELDS = ['watched', 'want_to_watch', 'favorites', 'notes_count',
+              'notes_sum']
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'genre'],
+                                    name='userstats_user_genre_unique'),
+            models.UniqueConstraint(fields=['user'],
+                                    condition=Q(genre__isnull=True),
+                                    name='userstats_user_total_unique'),
+        ]
+
+    def values(self):
+        average_note = 0.0
+        if self.notes_count:
+            average_note = round(self.notes_sum / self.notes_count, 2)
+        return {'watched': self.watched, 'want_to_watch': self.want_to_watch,
+                'favorites': self.favorites, 'notes_count': self.notes_count,
+                'average_note': average_note}
+
+
+# Películas y usuarios pendientes de recalcular dentro de
+# deferred_film_stats()
+_deferred_stats = ContextVar('deferred_film_stats', default=None)
+_deferred_users = ContextVar('deferred_user_stats', default=None)
+_deferred_tombstones = ContextVar('deferred_tombstones', default=None)
 
-def update_film_stats(sender, instance, **kwargs):
-    count_favorites = FilmUser.objects.filter(
-        film=instance.film, favorite=True).count()
-    instance.film.favorites = count_favorites
-    notes = FilmUser.objects.filter(
-        film=instance.film).exclude(note__isnull=True)
-    count_notes = notes.count()
-    sum_notes = notes.aggregate(Sum('note')).get('note__sum')
+
+@contextmanager
+def deferred_film_stats(users=()):
+    # Agrupa las estadísticas de muchas escrituras en un único recálculo
+    # por película y usuario al salir del bloque, y sus tombstones y tareas
+    # en un INSERT. Las escrituras en bloque (sin señales) añaden sus
+    # películas al conjunto devuelto y sus usuarios con users
+    films, users, tombstones = set(), set(users), []
+    token = _deferred_stats.set(films)
+    users_token = _deferred_users.set(users)
+    tombstones_token = _deferred_tombstones.set(tombstones)
     try:
-        instance.film.average_note = round(sum_notes/count_notes, 2)
-    except:
-        pass
-    instance.film.save()
+        yield films
+    finally:
+        _deferred_stats.reset(token)
+        _deferred_users.reset(users_token)
+        _deferred_tombstones.reset(tombstones_token)
+    FilmUserTombstone.objects.bulk_create(tombstones, batch_size=500)
+    Film.objects.filter(pk__in=films).rebuild_stats()
+    UserStats.objects.rebuild(users)
+    schedule_film_similarities(*films)
+
+
+def stats_delta(old, new):
+    favorites = notes_count = notes_sum = 0
+    for values, sign in ((old, -1), (new, 1)):
+        if values is None:
+            continue
+        favorite, note = values
+        if favorite:
+            favorites += sign
+        if note is not None:
+            notes_count += sign
+            notes_sum += sign * note
+    return favorites, notes_count, notes_sum
+
+
+def schedule_film_stats(film_id):
+    # Un único recálculo por película y ventana de FILM_STATS_WINDOW
+    enqueue('films.refresh_stats', {'film_id': str(film_id)},
+            dedup_key=f'film-stats:{film_id}',
+            delay=settings.FILM_STATS_WINDOW)
+
+
+def schedule_film_similarities(*film_ids):
+    # Vecinas de cada película recalculadas en el worker como mucho una vez
+    # cada RECOMMENDATIONS_WINDOW segundos
+    if settings.RECOMMENDATIONS_INCREMENTAL and film_ids:
+        enqueue_many('films.refresh_similarities', [
+            ({'film_id': str(film_id)}, f'film-similarities:{film_id}')
+            for film_id in film_ids], delay=settings.RECOMMENDATIONS_WINDOW)
+
+
+def affects_stats(update_fields):
+    # Los cambios de estado o reseña no afectan a las estadísticas ni a las
+    # similitudes (sólo cuentan favorite y note)
+    return update_fields is None or bool({'favorite', 'note'} & update_fields)
+
+
+def update_film_similarities(sender, instance, update_fields=None, **kwargs):
+    if _deferred_stats.get() is None and affects_stats(update_fields):
+        schedule_film_similarities(instance.film_id)
+
+
+def update_film_stats(sender, instance, created=False, update_fields=None,
+                      **kwargs):
+    if not affects_stats(update_fields):
+        return
+    films = Film.objects.filter(pk=instance.film_id)
+    new = instance.stats_values()
+    deferred = _deferred_stats.get()
+    if deferred is not None or settings.FILM_STATS_ASYNC:
+        if deferred is not None:
+            deferred.add(instance.film_id)
+        else:
+            schedule_film_stats(instance.film_id)
+        instance._stats_snapshot = new
+        return
+    if created:
+        old = None
+    elif hasattr(instance, '_stats_snapshot'):
+        old = instance._stats_snapshot
+    else:
+        # Sin estado original no hay delta posible, recalculamos la película
+        films.rebuild_stats()
+        instance._stats_snapshot = new
+        return
+    favorites, notes_count, notes_sum = stats_delta(old, new)
+    if favorites or notes_count or notes_sum:
+        films.apply_stats_delta(favorites, notes_count, notes_sum)
+        invalidate_film_stats(instance.film_id)
+    instance._stats_snapshot = new
+
+
+def remove_film_stats(sender, instance, **kwargs):
+    films = Film.objects.filter(pk=instance.film_id)
+    deferred = _deferred_stats.get()
+    if deferred is not None:
+        deferred.add(instance.film_id)
+    elif settings.FILM_STATS_ASYNC:
+        schedule_film_stats(instance.film_id)
+    elif hasattr(instance, '_stats_snapshot'):
+        favorites, notes_count, notes_sum = stats_delta(
+            instance._stats_snapshot, None)
+        if favorites or notes_count or notes_sum:
+            films.apply_stats_delta(favorites, notes_count, notes_sum)
+            invalidate_film_stats(instance.film_id)
+    else:
+        films.rebuild_stats()
+
+
+def user_stats_delta(old, new):
+    delta = dict.fromkeys(UserStats.FIELDS, 0)
+    for values, sign in ((old, -1), (new, 1)):
+        if values is None:
+            continue
+        state, favorite, note = values
+        delta['watched'] += sign * (state == 1)
+        delta['want_to_watch'] += sign * (state == 2)
+        delta['favorites'] += sign * bool(favorite)
+        if note is not None:
+            delta['notes_count'] += sign
+            delta['notes_sum'] += sign * note
+    return delta
+
+
+def update_user_stats(sender, instance, created=False, update_fields=None,
+                      **kwargs):
+    if update_fields is not None and \
+            not {'state', 'favorite', 'note'} & update_fields:
+        return
+    new = instance.user_stats_values()
+    deferred = _deferred_users.get()
+    if deferred is not None:
+        deferred.add(instance.user_id)
+    elif created or hasattr(instance, '_user_stats_snapshot'):
+        old = None if created else instance._user_stats_snapshot
+        UserStats.objects.apply_delta(
+            instance.user_id, film_genre_ids(instance.film_id),
+            user_stats_delta(old, new))
+    else:
+        UserStats.objects.rebuild([instance.user_id])
+    instance._user_stats_snapshot = new
+
+
+def is_user_deletion(origin):
+    origin_model = getattr(origin, 'model', type(origin))
+    return origin_model is FilmUser.user.field.related_model
+
+
+def prepare_user_stats_delete(sender, instance, origin=None, **kwargs):
+    # Al borrar la película la tabla intermedia se vacía antes del
+    # post_delete: guardamos aquí sus géneros
+    deferred = _deferred_users.get()
+    if is_user_deletion(origin):
+        return
+    if deferred is not None:
+        deferred.add(instance.user_id)
+    else:
+        instance._user_stats_genres = film_genre_ids(instance.film_id)
+
+
+def remove_user_stats(sender, instance, **kwargs):
+    if not hasattr(instance, '_user_stats_genres'):
+        return
+    if hasattr(instance, '_user_stats_snapshot'):
+        UserStats.objects.apply_delta(
+            instance.user_id, instance._user_stats_genres,
+            user_stats_delta(instance._user_stats_snapshot, None))
+    else:
+        UserStats.objects.rebuild([instance.user_id])
+
+
+def schedule_user_stats(film_id):
+    # Al cambiar los géneros de una película se recalcula el desglose de
+    # todos sus usuarios en el worker
+    enqueue('films.rebuild_user_stats', {'film_id': str(film_id)},
+            dedup_key=f'user-stats:{film_id}')
+
+
+def update_film_genres_user_stats(sender, instance, action, reverse,
+                                  pk_set=None, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._user_stats_films = list(
+            instance.film_genres.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        films = [instance.pk]
+    elif action == 'post_clear':
+        films = instance._user_stats_films
+    else:
+        films = pk_set
+    for film_id in films:
+        schedule_user_stats(film_id)
+
+
+def create_film_user_tombstone(sender, instance, origin=None, **kwargs):
+    # Si se está borrando el propio usuario no hay nada que sincronizar
+    if is_user_deletion(origin):
+        return
+    tombstone = FilmUserTombstone(
+        user_id=instance.user_id, film_id=instance.film_id)
+    deferred = _deferred_tombstones.get()
+    if deferred is not None:
+        deferred.append(tombstone)
+    else:
+        tombstone.save()
 
 
 post_save.connect(update_film_stats, sender=FilmUser)
+post_delete.connect(remove_film_stats, sender=FilmUser)
+post_delete.connect(create_film_user_tombstone, sender=FilmUser)
+post_save.connect(update_film_similarities, sender=FilmUser)
+post_delete.connect(update_film_similarities, sender=FilmUser)
+post_save.connect(update_user_stats, sender=FilmUser)
+pre_delete.connect(prepare_user_stats_delete, sender=FilmUser)
+post_delete.connect(remove_user_stats, sender=FilmUser)
+m2m_changed.connect(update_film_genres_user_stats,
+                    sender=Film.genres.through)
+
+
+def update_film_search(sender, instance, **kwargs):
+    Film.objects.filter(pk=instance.pk).reindex_search()
+
+
+def update_genre_search(sender, instance, **kwargs):
+    Film.objects.filter(genres=instance).reindex_search()
+
+
+def prepare_genre_delete_search(sender, instance, **kwargs):
+    # Al borrar el género se pierde la relación antes del post_delete
+    instance._search_films = list(
+        instance.film_genres.values_list('pk', flat=True))
+
+
+def delete_genre_search(sender, instance, **kwargs):
+    Film.objects.filter(pk__in=instance._search_films).reindex_search()
+
+
+def update_film_genres_search(sender, instance, action, reverse,
+                              pk_set=None, **kwargs):
+    if reverse and action == 'pre_clear':
+        # Guardamos las películas antes de perder la relación
+        instance._search_films = list(
+            instance.film_genres.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        films = Film.objects.filter(pk=instance.pk)
+    elif action == 'post_clear':
+        films = Film.objects.filter(pk__in=instance._search_films)
+    else:
+        films = Film.objects.filter(pk__in=pk_set)
+    films.reindex_search()
+
+
+def prepare_film_delete_genres(sender, instance, **kwargs):
+    # El borrado en cascada de la tabla intermedia no emite m2m_changed
+    instance._count_genres = list(
+        instance.genres.values_list('pk', flat=True))
+
+
+def delete_film_genres_count(sender, instance, **kwargs):
+    FilmGenre.objects.filter(
+        pk__in=instance._count_genres).refresh_films_count()
+
+
+def update_genre_films_count(sender, instance, action, reverse,
+                             pk_set=None, **kwargs):
+    if not reverse and action == 'pre_clear':
+        instance._count_genres = list(
+            instance.genres.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        genres = FilmGenre.objects.filter(pk=instance.pk)
+    elif action == 'post_clear':
+        genres = FilmGenre.objects.filter(pk__in=instance._count_genres)
+    else:
+        genres = FilmGenre.objects.filter(pk__in=pk_set)
+    genres.refresh_films_count()
+
+
+post_save.connect(update_image_variants, sender=Film)
+post_save.connect(update_film_search, sender=Film)
+post_save.connect(update_genre_search, sender=FilmGenre)
+pre_delete.connect(prepare_genre_delete_search, sender=FilmGenre)
+post_delete.connect(delete_genre_search, sender=FilmGenre)
+m2m_changed.connect(update_film_genres_search, sender=Film.genres.through)
+pre_delete.connect(prepare_film_delete_genres, sender=Film)
+post_delete.connect(delete_film_genres_count, sender=Film)
+m2m_changed.connect(update_genre_films_count, sender=Film.genres.through)
+
+# Invalidación de la caché de respuestas del catálogo
+post_save.connect(invalidate_film, sender=Film)
+post_delete.connect(invalidate_film, sender=Film)
+post_save.connect(invalidate_genre, sender=FilmGenre)
+post_delete.connect(invalidate_genre, sender=FilmGenre)
+m2m_changed.connect(invalidate_film_genres, sender=Film.genres.through)
@@ -0,0 +1,69 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _serializer_fields(serializer):
+    if isinstance(serializer, type):
+        serializer = serializer()
+    return serializer.fields.values()
+
+
+def _plan(model, serializer, prefix=''):
+    # Recorremos los campos del serializer y traducimos cada uno a la
+    # columna, join o prefetch que necesita para serializarse sin queries
+    only, select, prefetch = [], [], []
+    exact = True  # Si algún campo no se puede resolver no usamos only()
+
+    for field in _serializer_fields(serializer):
+        if field.write_only or field.source == '*':
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            exact = False
+            continue
+
+        nested = field.child if isinstance(
+            field, serializers.ListSerializer) else field
+        is_nested = isinstance(nested, serializers.ModelSerializer)
+
+        if model_field.many_to_many or model_field.one_to_many:
+            related = model_field.related_model
+            queryset = related._default_manager.all()
+            if is_nested:
+                # En las inversas de una FK necesitamos la FK para unir
+                required = [model_field.field.name] \
+                    if model_field.one_to_many else []
+                queryset = optimize_queryset(queryset, nested, required)
+            prefetch.append(Prefetch(prefix + field.source, queryset=queryset))
+        elif model_field.is_relation and is_nested:
+            path = prefix + field.source
+            select.append(path)
+            only.append(path)
+            sub_only, sub_select, sub_prefetch, sub_exact = _plan(
+                model_field.related_model, nested, path + '__')
+            only += sub_only
+            select += sub_select
+            prefetch += sub_prefetch
+            exact = exact and sub_exact
+        elif model_field.concrete:
+            only.append(prefix + model_field.name)
+        else:
+            exact = False
+
+    return only, select, prefetch, exact
+
+
+def optimize_queryset(queryset, serializer, required=()):
+    # Construye el queryset a partir de la declaración del serializer para
+    # evitar el N+1 de los serializers anidados
+    only, select, prefetch, exact = _plan(queryset.model, serializer)
+    only += required
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if exact and only:
+        queryset = queryset.only(*only)
+    return queryset
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+from .cache import bump_versions
+from .models import Film, FilmRanking, FilmUser
+
+# Clasificaciones materializadas: cada una se calcula fuera de las peticiones
+# (python manage.py refresh_rankings) y se guarda como una lista ordenada de
+# RANKINGS_SIZE posiciones
+
+TRENDING_WINDOWS = {
+    'trending_day': timedelta(days=1),
+    'trending_week': timedelta(days=7),
+    'trending_month': timedelta(days=30),
+}
+
+
+def top_rated_scores():
+    # Media bayesiana: cada película parte de RANKINGS_PRIOR_VOTES notas
+    # con la media global, así una única nota de 10 no encabeza la lista
+    totals = Film.objects.aggregate(
+        count=Sum('notes_count'), sum=Sum('notes_sum'))
+    if not totals['count']:
+        return []
+    prior = settings.RANKINGS_PRIOR_VOTES
+    mean = totals['sum'] / totals['count']
+    score = (Cast('notes_sum', FloatField()) + prior * mean) / \
+        (F('notes_count') + prior)
+    return Film.objects.filter(notes_count__gt=0) \
+        .annotate(score=score).order_by('-score', 'id') \
+        .values_list('id', 'score')[:settings.RANKINGS_SIZE]
+
+
+def trending_scores(window):
+    # Actividad de la ventana: cada película que se añade, puntúa o marca
+    # como favorita en ese periodo cuenta un punto más si es favorita
+    since = timezone.now() - window
+    score = Count('id') + Count('id', filter=Q(favorite=True))
+    return FilmUser.objects.filter(updated_at__gte=since) \
+        .values('film').annotate(score=Cast(score, FloatField())) \
+        .order_by('-score', 'film').values_list('film', 'score') \
+        [:settings.RANKINGS_SIZE]
+
+
+def compute_ranking(kind):
+    if kind == 'top_rated':
+        return list(top_rated_scores())
+    return list(trending_scores(TRENDING_WINDOWS[kind]))
+
+
+RANKINGS = ['top_rated', *TRENDING_WINDOWS]
+
+
+def refresh_ranking(kind):
+    # Sólo escribe las posiciones que han cambiado desde el último cálculo
+    ranking = compute_ranking(kind)
+    current = {row.position: row
+               for row in FilmRanking.objects.filter(kind=kind)}
+    created, updated = [], []
+    for position, (film_id, score) in enumerate(ranking, 1):
+        row = current.pop(position, None)
+        if row is None:
+            created.append(FilmRanking(
+                kind=kind, position=position, film_id=film_id, score=score))
+        elif row.film_id != film_id or row.score != score:
+            row.film_id, row.score = film_id, score
+            updated.append(row)
+
+    with transaction.atomic():
+        FilmRanking.objects.filter(
+            pk__in=[row.pk for row in current.values()]).delete()
+        FilmRanking.objects.bulk_update(updated, ['film', 'score'])
+        FilmRanking.objects.bulk_create(created)
+    changes = len(created) + len(updated) + len(current)
+    if changes:
+        bump_versions(f'ranking:{kind}')
+    return changes
@@ -0,0 +1,147 @@
+import math
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from .models import Film, FilmSimilarity, FilmUser
+
+# Recomendaciones item-item: similitud coseno entre películas según las
+# interacciones de los usuarios, guardando sólo las RECOMMENDATIONS_NEIGHBORS
+# vecinas más parecidas de cada película
+
+
+def strength(favorite, note):
+    # Interés del usuario en la película: 1 por tenerla en su lista, +1 si es
+    # favorita y de -1 a +1 según la nota
+    value = 1.0 + (1.0 if favorite else 0.0)
+    if note is not None:
+        value += (note - 5) / 5
+    return value
+
+
+def strength_expression(prefix=''):
+    # La misma fórmula en SQL sobre los campos de FilmUser
+    return Value(1.0) + Case(
+        When(**{prefix + 'favorite': True}, then=Value(1.0)),
+        default=Value(0.0), output_field=FloatField()) + Coalesce(
+        (Cast(prefix + 'note', FloatField()) - 5) / 5, Value(0.0),
+        output_field=FloatField())
+
+
+def import_numpy():
+    try:
+        import numpy
+        from scipy import sparse
+    except ImportError:
+        raise ImportError('El cálculo de las recomendaciones necesita numpy '
+                          'y scipy (pip install numpy scipy)')
+    return numpy, sparse
+
+
+def interaction_matrix(chunk_size=20000):
+    # Matriz dispersa usuarios x películas con la fuerza de cada interacción
+    numpy, sparse = import_numpy()
+    users, films = {}, {}
+    rows, cols, values = [], [], []
+    interactions = FilmUser.objects.values_list(
+        'user_id', 'film_id', 'favorite', 'note').iterator(chunk_size)
+    for user_id, film_id, favorite, note in interactions:
+        rows.append(users.setdefault(user_id, len(users)))
+        cols.append(films.setdefault(film_id, len(films)))
+        values.append(strength(favorite, note))
+    matrix = sparse.csr_matrix(
+        (numpy.array(values, dtype=numpy.float32), (rows, cols)),
+        shape=(len(users), len(films)))
+    return matrix, list(films)
+
+
+def compute_similarities(matrix, neighbors, chunk_size=512):
+    # Genera (película, vecina, similitud) por bloques de columnas para no
+    # construir la matriz películas x películas completa
+    numpy, sparse = import_numpy()
+    norms = numpy.sqrt(numpy.asarray(matrix.multiply(matrix).sum(axis=0)))
+    norms = norms.ravel()
+    norms[norms == 0] = 1
+    normalized = sparse.csc_matrix(matrix.multiply(1 / norms))
+    transposed = normalized.T.tocsr()
+
+    count = matrix.shape[1]
+    k = min(neighbors, count - 1)
+    if k <= 0:
+        return
+    for start in range(0, count, chunk_size):
+        end = min(start + chunk_size, count)
+        block = (transposed @ normalized[:, start:end]).toarray()
+        columns = numpy.arange(end - start)
+        block[columns + start, columns] = 0  # la propia película
+        top = numpy.argpartition(-block, k - 1, axis=0)[:k]
+        for column in range(end - start):
+            for row in top[:, column]:
+                score = block[row, column]
+                if score > 0:
+                    yield start + column, row, float(score)
+
+
+def rebuild_similarities(neighbors=None, batch_size=5000):
+    neighbors = neighbors or settings.RECOMMENDATIONS_NEIGHBORS
+    matrix, film_ids = interaction_matrix()
+    similarities = [
+        FilmSimilarity(film_id=film_ids[film], neighbor_id=film_ids[neighbor],
+                       score=score)
+        for film, neighbor, score in compute_similarities(matrix, neighbors)]
+    with transaction.atomic():
+        FilmSimilarity.objects.all().delete()
+        FilmSimilarity.objects.bulk_create(similarities, batch_size=batch_size)
+    return len(similarities)
+
+
+def refresh_film_similarities(film_id, neighbors=None):
+    # Actualización incremental de una película en SQL: productos escalares
+    # con las películas de los usuarios que la tienen y sus normas
+    neighbors = neighbors or settings.RECOMMENDATIONS_NEIGHBORS
+    film_id = Film._meta.pk.to_python(film_id)
+    dots = dict(FilmUser.objects.filter(user__filmuser__film=film_id)
+                .values_list('film').annotate(dot=Sum(
+                    strength_expression() *
+                    strength_expression('user__filmuser__'))))
+    norms = dict(FilmUser.objects.filter(film__in=list(dots))
+                 .values_list('film').annotate(norm=Sum(
+                     strength_expression() * strength_expression())))
+    own_norm = math.sqrt(norms.pop(film_id, 0) or 1)
+    dots.pop(film_id, None)
+
+    scores = {
+        other: dot / (own_norm * math.sqrt(norms[other] or 1))
+        for other, dot in dots.items() if dot > 0}
+    top = sorted(scores.items(), key=lambda item: -item[1])[:neighbors]
+
+    with transaction.atomic():
+        FilmSimilarity.objects.filter(film=film_id).delete()
+        FilmSimilarity.objects.bulk_create([
+            FilmSimilarity(film_id=film_id, neighbor_id=other, score=score)
+            for other, score in top])
+        # La similitud es simétrica: corregimos las listas donde ya aparece
+        reverse = list(FilmSimilarity.objects.filter(neighbor=film_id))
+        for similarity in reverse:
+            similarity.score = scores.get(similarity.film_id, 0.0)
+        FilmSimilarity.objects.bulk_update(reverse, ['score'])
+    return len(top)
+
+
+def recommended_films(user, limit):
+    # Películas vecinas de las del usuario que aún no tiene, puntuadas por la
+    # similitud y su interés en cada película de origen
+    scores = list(
+        FilmSimilarity.objects.filter(film__filmuser__user=user)
+        .exclude(neighbor__filmuser__user=user)
+        .values_list('neighbor')
+        .annotate(rank=Sum(F('score') * strength_expression(
+            'film__filmuser__')))
+        .filter(rank__gt=0).order_by('-rank', 'neighbor')[:limit])
+    return dict(scores)
+
+
+def popular_films(user):
+    # Sin historial suficiente recomendamos las películas más populares
+    return Film.objects.exclude(filmuser__user=user) \
+        .order_by('-favorites', '-average_note', 'id')
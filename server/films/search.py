@@ -0,0 +1,47 @@
+import re
+import unicodedata
+
+# Pesos de cada campo en el ranking de la búsqueda
+TITLE_WEIGHT = 10
+GENRE_WEIGHT = 5
+YEAR_WEIGHT = 5
+REVIEW_WEIGHT = 1
+
+MAX_TOKEN_LENGTH = 50
+MAX_QUERY_TERMS = 8
+
+
+def normalize(text):
+    # Quitamos acentos y mayúsculas: "Acción" -> "accion", "Año" -> "ano"
+    text = unicodedata.normalize('NFKD', str(text))
+    text = text.encode('ascii', 'ignore').decode('ascii')
+    return text.lower()
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [token[:MAX_TOKEN_LENGTH]
+            for token in re.findall(r'[a-z0-9]+', normalize(text))]
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def film_tokens(title, year, review_short, genre_names):
+    # Diccionario token -> peso acumulado de todos los campos de la película
+    tokens = {}
+    fields = [(title, TITLE_WEIGHT), (year, YEAR_WEIGHT),
+              (review_short, REVIEW_WEIGHT)]
+    fields += [(name, GENRE_WEIGHT) for name in genre_names]
+    for text, weight in fields:
+        for token in tokenize(text):
+            tokens[token] = tokens.get(token, 0) + weight
+    return tokens
+
+
+def prefix_range(term):
+    # Rango [term, sucesor) equivalente a un LIKE 'term%' que sí usa el
+    # índice del token en cualquier base de datos (los tokens son ASCII)
+    return term, term[:-1] + chr(ord(term[-1]) + 1)
@@ -1,42 +1,136 @@
 from rest_framework import serializers
+from server.images import SrcsetField
+from server.metrics import TimedSerializerMixin
 from .models import Film, FilmGenre, FilmUser
 
 
-class FilmGenreSerializer(serializers.ModelSerializer):
+def split_names(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    return [name.strip() for name in value or [] if name.strip()]
+
+
+class SparseFieldsetMixin:
+    # ?fields=id,title limita la respuesta a esos campos y ?expand=genres
+    # añade campos que no están en Meta.default_fields. Con puntos se aplican
+    # a los serializers anidados: ?fields=note,film.title&expand=film.genres
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self.sparse_fields = fields
+        self.sparse_expand = expand
+        super().__init__(*args, **kwargs)
+
+    def is_root(self):
+        return self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer)
+            and self.parent.parent is None)
+
+    def get_sparse_names(self):
+        fields, expand = self.sparse_fields, self.sparse_expand
+        request = self.context.get('request')
+        if fields is None and expand is None and request and self.is_root():
+            fields = request.query_params.get('fields')
+            expand = request.query_params.get('expand')
+        return split_names(fields), split_names(expand)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self.get_sparse_names()
+        default = getattr(self.Meta, 'default_fields', None) or fields
+
+        selected = {name.split('.')[0] for name in only or default}
+        selected |= {name.split('.')[0] for name in expand}
+        unknown = selected - set(fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {'fields': f"Campos desconocidos: {', '.join(sorted(unknown))}"})
+
+        for name in list(fields):
+            if name not in selected:
+                del fields[name]
+                continue
+            # Selección de los anidados
+            nested = fields[name]
+            if isinstance(nested, serializers.ListSerializer):
+                nested = nested.child
+            if isinstance(nested, SparseFieldsetMixin):
+                prefix = name + '.'
+                nested_only = [n[len(prefix):] for n in only
+                               if n.startswith(prefix)]
+                nested_expand = [n[len(prefix):] for n in expand
+                                 if n.startswith(prefix)]
+                nested.sparse_fields = nested_only or None
+                nested.sparse_expand = nested_expand or None
+        return fields
+
+
+class FilmGenreSerializer(TimedSerializerMixin, SparseFieldsetMixin,
+                          serializers.ModelSerializer):
 
     class Meta:
         model = FilmGenre
         fields = '__all__'
 
-    class NestedFilmSerializer(serializers.ModelSerializer):
+    class NestedFilmSerializer(SparseFieldsetMixin,
+                               serializers.ModelSerializer):
 
         class Meta:
             model = Film
-            fields = ['id', 'title', 'image_thumbnail']
+            fields = ['id', 'title', 'image_thumbnail',
+                      'image_thumbnail_srcset', 'favorites', 'average_note']
 
-    films = NestedFilmSerializer(
-        many=True, source="film_genres")  # query reversa
+        image_thumbnail_srcset = SrcsetField('image_thumbnail')
 
+    # Las mejores películas del género (el listado completo se pagina en
+    # /api/genres/<slug>/films/)
+    top_films = NestedFilmSerializer(many=True, read_only=True)
 
-class FilmSerializer(serializers.ModelSerializer):
+
+class FilmSerializer(TimedSerializerMixin, SparseFieldsetMixin,
+                     serializers.ModelSerializer):
 
     class Meta:
         model = Film
-        fields = '__all__'
+        exclude = ['image_variants']
 
-    class NestedFilmGenreSerializer(serializers.ModelSerializer):
+    class NestedFilmGenreSerializer(SparseFieldsetMixin,
+                                    serializers.ModelSerializer):
 
         class Meta:
             model = FilmGenre
             fields = '__all__'
 
     genres = NestedFilmGenreSerializer(many=True)
+    image_thumbnail_srcset = SrcsetField('image_thumbnail')
+    image_wallpaper_srcset = SrcsetField('image_wallpaper')
+
+
+class FilmListSerializer(FilmSerializer):
+    # Representación compacta para los listados, el resto con ?expand=
 
+    class Meta(FilmSerializer.Meta):
+        default_fields = ['id', 'title', 'year', 'image_thumbnail',
+                          'image_thumbnail_srcset', 'favorites',
+                          'average_note']
 
-class FilmUserSerializer(serializers.ModelSerializer):
 
-    film = FilmSerializer(read_only=True)
+class FilmUserSerializer(TimedSerializerMixin, SparseFieldsetMixin,
+                         serializers.ModelSerializer):
+
+    film = FilmListSerializer(read_only=True)
 
     class Meta:
         model = FilmUser
         fields = ['film', 'favorite', 'note', 'state', 'review']
+
+
+class FilmUserBatchItemSerializer(serializers.Serializer):
+    uuid = serializers.UUIDField()
+    state = serializers.ChoiceField(
+        choices=FilmUser.STATUS_CHOICES, default=0)
+    favorite = serializers.BooleanField(
+        default=False)
+    note = serializers.IntegerField(
+        min_value=0, max_value=10, allow_null=True, default=None)
+    review = serializers.CharField(
+        allow_null=True, allow_blank=True, default=None)
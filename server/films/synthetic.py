@@ -0,0 +1,100 @@
+import random
+from itertools import accumulate
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils.text import slugify
+from .models import Film, FilmGenre, FilmUser, UserStats
+
+# Generador de catálogos sintéticos para los benchmarks
+
+GENRES = [
+    'Acción', 'Animación', 'Aventura', 'Bélico', 'Ciencia ficción',
+    'Comedia', 'Crimen', 'Documental', 'Drama', 'Familiar', 'Fantasía',
+    'Histórico', 'Misterio', 'Musical', 'Romance', 'Suspense', 'Terror',
+    'Western',
+]
+
+WORDS = [
+    'amor', 'noche', 'corazón', 'ciudad', 'último', 'secreto', 'sombra',
+    'guerra', 'camino', 'tiempo', 'mar', 'fuego', 'hielo', 'estrella',
+    'montaña', 'río', 'jardín', 'invierno', 'verano', 'canción', 'ladrón',
+    'héroe', 'reina', 'rey', 'espía', 'fantasma', 'máquina', 'planeta',
+    'lágrimas', 'venganza', 'destino', 'viaje', 'isla', 'bosque', 'león',
+    'dragón', 'mañana', 'ayer', 'silencio', 'pasión', 'misión', 'tormenta',
+    'cazador', 'niño', 'ángel', 'demonio', 'luna', 'sol', 'desierto',
+    'frontera', 'imperio', 'familia', 'hermanos', 'perdido', 'oscuro',
+    'rápido', 'salvaje', 'eterno', 'infierno', 'paraíso', 'código',
+]
+
+
+def create_genres(count=len(GENRES)):
+    names = GENRES[:count] + [
+        f'Género {i}' for i in range(len(GENRES), count)]
+    # Por slug: reutiliza los géneros que ya existen con otra capitalización
+    slugs = [slugify(name) for name in names]
+    for name, slug in zip(names, slugs):
+        FilmGenre.objects.get_or_create(slug=slug, defaults={'name': name})
+    return list(FilmGenre.objects.filter(slug__in=slugs))
+
+
+def random_text(rng, min_words, max_words):
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return ' '.join(words).capitalize()
+
+
+def create_films(count, genres, seed=0, batch_size=2000):
+    # Películas con 1-3 géneros e índice de búsqueda, en lotes
+    rng = random.Random(seed)
+    through = Film.genres.through
+    created = []
+    for start in range(0, count, batch_size):
+        films = Film.objects.bulk_create([
+            Film(title=random_text(rng, 1, 4),
+                 year=rng.randint(1950, 2024),
+                 review_short=random_text(rng, 8, 20))
+            for _ in range(min(batch_size, count - start))])
+        through.objects.bulk_create([
+            through(film_id=film.pk, filmgenre_id=genre.pk)
+            for film in films
+            for genre in rng.sample(genres, rng.randint(1, min(3, len(genres))))])
+        Film.objects.filter(pk__in=[film.pk for film in films]) \
+            .reindex_search()
+        created += films
+    FilmGenre.objects.filter(
+        pk__in=[genre.pk for genre in genres]).refresh_films_count()
+    return created
+
+
+def create_users(count, password='benchmark', batch_size=2000):
+    # Todos comparten el mismo hash para no pagar el hasher por usuario
+    User = get_user_model()
+    hashed = make_password(password)
+    offset = User.objects.count()
+    return User.objects.bulk_create([
+        User(username=f'user{offset + i}',
+             email=f'user{offset + i}@example.com', password=hashed)
+        for i in range(count)], batch_size=batch_size)
+
+
+def create_ratings(count, users, films, seed=0, batch_size=5000):
+    # Popularidad sesgada (tipo Zipf): pocas películas acumulan muchas notas
+    rng = random.Random(seed)
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(films))))
+    count = min(count, len(users) * len(films))
+    # dict y no set: el orden de inserción no depende del hash de los uuid y
+    # cada ejecución con la misma semilla asigna las mismas notas
+    pairs = {}
+    while len(pairs) < count:
+        for film in rng.choices(films, cum_weights=cum_weights,
+                                k=count - len(pairs)):
+            pairs[rng.choice(users).pk, film.pk] = None
+    FilmUser.objects.bulk_create([
+        FilmUser(user_id=user_id, film_id=film_id,
+                 state=rng.choice([1, 1, 1, 2]),
+                 favorite=rng.random() < 0.2,
+                 note=rng.choice([None, *range(1, 11)]))
+        for user_id, film_id in pairs], batch_size=batch_size)
+    Film.objects.filter(
+        pk__in=FilmUser.objects.values('film')).rebuild_stats()
+    UserStats.objects.rebuild({user_id for user_id, _ in pairs})
+    return len(pairs)
@@ -0,0 +1,19 @@
+from jobs.queue import task
+from .models import Film, FilmUser, UserStats
+from .recommendations import refresh_film_similarities
+
+
+@task('films.refresh_stats')
+def refresh_stats(film_id):
+    Film.objects.filter(pk=film_id).rebuild_stats()
+
+
+@task('films.refresh_similarities')
+def refresh_similarities(film_id):
+    refresh_film_similarities(film_id)
+
+
+@task('films.rebuild_user_stats')
+def rebuild_user_stats(film_id):
+    UserStats.objects.rebuild(FilmUser.objects.filter(
+        film=film_id).values_list('user', flat=True).iterator())
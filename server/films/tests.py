@@ -1,3 +1,494 @@
+import base64
+import json
+import uuid
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from .models import (Film, FilmGenre, FilmUser, FilmUserTombstone,
+                     UserStats)
+from .views import ExtendedPagination
+
+
+# Presupuesto de consultas por endpoint: cada petición se mide con una
+# película (o un elemento) de un género y otra vez con más de una página de
+# películas de varios géneros; el número no debe cambiar (N+1)
+
+class QueryBudgetTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='user', email='user@example.com', password='password')
+        cls.genres = [FilmGenre.objects.create(name=f'Género {i}')
+                      for i in range(6)]
+        cls.film = cls.create_films(1, genres=1)[0]
+
+    @classmethod
+    def create_films(cls, count, genres, rated=True):
+        films = []
+        for i in range(count):
+            film = Film.objects.create(title=f'Película {i}', year=1990 + i)
+            film.genres.set(cls.genres[:genres])
+            if rated:
+                FilmUser.objects.create(user=cls.user, film=film, state=1,
+                                        note=i % 10 + 1, favorite=i % 2 == 0)
+            films.append(film)
+        return films
+
+    def setUp(self):
+        # Sin respuestas cacheadas ni cubos de limitación de otros tests
+        cache.clear()
+
+    def login(self):
+        # Sesión y usuario: 2 consultas más en cada petición
+        self.client.force_login(self.user)
+
+    def request(self, num, url, data=None):
+        cache.clear()
+        with self.assertNumQueries(num):
+            if data is None:
+                response = self.client.get(url)
+            else:
+                response = self.client.post(
+                    url, data, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def assertConstantQueries(self, num, url, grow=None, data=None):
+        # Misma cuenta antes y después de añadir 20 películas de 6 géneros
+        # (más de una página de ExtendedPagination)
+        self.request(num, url, data)
+        (grow or self.grow)()
+        return self.request(num, url, data)
+
+    def grow(self):
+        self.create_films(20, genres=len(self.genres))
+
+
+class FilmQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_list(self):
+        # COUNT y la página, con los géneros en la misma consulta
+        response = self.assertConstantQueries(2, '/api/films/')
+        self.assertEqual(len(response.data['results']),
+                         ExtendedPagination.page_size)
+
+    def test_list_ordered_by_stats(self):
+        self.assertConstantQueries(2, '/api/films/?ordering=-average_note')
+
+    def test_list_expanded(self):
+        # Un prefetch para todos los géneros de la página
+        self.assertConstantQueries(3, '/api/films/?expand=genres')
+
+    def test_list_cached(self):
+        self.request(2, '/api/films/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/films/')
+
+    def test_detail(self):
+        url = f'/api/films/{self.film.pk}/'
+        response = self.assertConstantQueries(
+            2, url, lambda: self.film.genres.set(self.genres))
+        self.assertEqual(len(response.data['genres']), len(self.genres))
+
+    def test_genres(self):
+        self.assertConstantQueries(2, '/api/genres/')
+        self.assertConstantQueries(2, f'/api/genres/{self.genres[0].slug}/')
+
+    def test_genre_films(self):
+        self.assertConstantQueries(
+            3, f'/api/genres/{self.genres[0].slug}/films/')
+
+
+class FilmUserQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def test_list(self):
+        response = self.assertConstantQueries(4, '/api/userfilms/')
+        self.assertEqual(len(response.data['results']), 21)
+
+    def test_page_size(self):
+        self.grow()
+        response = self.request(4, '/api/userfilms/?page_size=1')
+        self.assertEqual(len(response.data['results']), 1)
+        response = self.request(4, '/api/userfilms/?page_size=21')
+        self.assertEqual(len(response.data['results']), 21)
+
+    def test_list_expanded(self):
+        self.assertConstantQueries(5, '/api/userfilms/?expand=film.genres')
+
+    def test_sync(self):
+        since = self.client.get('/api/userfilms/').data['sync_token']
+        film_user = FilmUser.objects.get(user=self.user, film=self.film)
+        film_user.note = 1
+        film_user.save()
+        films = self.create_films(20, genres=len(self.genres))
+        response = self.request(5, f'/api/userfilms/?since={since}')
+        self.assertEqual(len(response.data['results']), 21)
+        FilmUser.objects.filter(film__in=films).delete()
+        response = self.request(5, f'/api/userfilms/?since={since}')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(len(response.data['deleted']), 20)
+
+    def test_post_unchanged(self):
+        # Sin cambios no hay escrituras: sólo la fila bloqueada
+        film_user = FilmUser.objects.get(user=self.user, film=self.film)
+        self.request(5, '/api/userfilms/', {
+            'uuid': str(self.film.pk), 'state': film_user.state,
+            'note': film_user.note, 'favorite': film_user.favorite})
+
+    def batch(self, num, films, **values):
+        return self.request(num, '/api/userfilms/batch/', [
+            dict(uuid=str(film.pk), **values) for film in films])
+
+    def test_batch(self):
+        one = self.create_films(1, genres=1, rated=False)
+        many = self.create_films(20, genres=len(self.genres), rated=False)
+        # Altas, cambios y borrados: el mismo número con 1 y con 20
+        for values in [{'state': 1, 'note': 5}, {'state': 1, 'note': 6}]:
+            self.batch(16, one, **values)
+            self.batch(16, many, **values)
+        self.batch(18, one, state=0)
+        response = self.batch(18, many, state=0)
+        self.assertEqual(response.data['deleted'], 20)
+
+
+class SyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='user', email='user@example.com', password='password')
+        cls.films = [Film.objects.create(title=f'Película {i}', year=2000 + i)
+                     for i in range(3)]
+        for film in cls.films:
+            FilmUser.objects.create(user=cls.user, film=film, state=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def sync(self, since):
+        return self.client.get('/api/userfilms/', {'since': since})
+
+    def test_sync_token(self):
+        response = self.client.get('/api/userfilms/')
+        since = response.data['sync_token']
+        FilmUser.objects.get(user=self.user, film=self.films[0]).delete()
+        film_user = FilmUser.objects.get(user=self.user, film=self.films[1])
+        film_user.note = 8
+        film_user.save()
+
+        response = self.sync(since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['film']['id'] for item in
+                          response.data['results']], [str(self.films[1].pk)])
+        self.assertEqual(response.data['deleted'], [self.films[0].pk])
+
+    def test_naive_token(self):
+        # Sin zona horaria se toma como UTC (TIME_ZONE)
+        since = (timezone.now() - timedelta(minutes=1)).strftime(
+            '%Y-%m-%dT%H:%M:%S')
+        FilmUser.objects.get(user=self.user, film=self.films[0]).delete()
+        response = self.sync(since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['deleted'], [self.films[0].pk])
+
+    async def test_naive_token_async(self):
+        since = (timezone.now() - timedelta(minutes=1)).strftime(
+            '%Y-%m-%dT%H:%M:%S')
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            '/api/async/userfilms/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+
+    def test_expired_token(self):
+        since = timezone.now() - timedelta(
+            days=settings.SYNC_TOMBSTONE_DAYS + 1)
+        response = self.sync(since.strftime('%Y-%m-%dT%H:%M:%SZ'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_malformed_token(self):
+        for since in ['ayer', '2026-10-18', '2026-13-45T00:00:00Z']:
+            with self.subTest(since=since):
+                self.assertEqual(self.sync(since).status_code, 400)
+
+
+class FilmStatsTests(TestCase):
+    # Los contadores incrementales deben coincidir siempre con un recálculo
+    # desde cero (rebuild_film_stats)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.film = Film.objects.create(title='Película', year=2000)
+        cls.users = [get_user_model().objects.create_user(
+            username=f'user{i}', email=f'user{i}@example.com',
+            password='password') for i in range(8)]
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, user, **values):
+        self.client.force_login(user)
+        response = self.client.post('/api/userfilms/', dict(
+            uuid=str(self.film.pk), **values),
+            content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def assertInSync(self):
+        stale = Film.objects.filter(pk=self.film.pk).rebuild_stats(
+            commit=False)
+        self.assertEqual(stale, [])
+
+    def test_deltas(self):
+        user = self.users[0]
+        steps = [
+            ('alta', {'state': 1, 'note': 7, 'favorite': True}),
+            ('cambio de nota', {'state': 1, 'note': 4, 'favorite': True}),
+            ('sin cambios', {'state': 1, 'note': 4, 'favorite': True}),
+            ('sin favorito', {'state': 1, 'note': 4, 'favorite': False}),
+            ('sin nota', {'state': 1, 'note': None, 'favorite': False}),
+            ('nota de nuevo', {'state': 2, 'note': 9, 'favorite': True}),
+            ('borrado', {'state': 0}),
+        ]
+        for step, values in steps:
+            with self.subTest(step=step):
+                self.post(user, **values)
+                self.assertInSync()
+
+    def test_rounding_tie(self):
+        # 1/8 = 0.125 es exacto en coma flotante: round() de Python da 0.12
+        # y ROUND de la base de datos 0.13
+        for i, user in enumerate(self.users):
+            self.post(user, state=1, note=1 if i == 0 else 0)
+            self.assertInSync()
+
+    def test_migration_backfill(self):
+        for i, user in enumerate(self.users):
+            FilmUser.objects.create(user=user, film=self.film, state=1,
+                                    note=1 if i == 0 else 0)
+        Film.objects.filter(pk=self.film.pk).update(
+            favorites=0, notes_count=0, notes_sum=0, average_note=0)
+        migration = import_module('films.migrations.0005_film_stats_counters')
+        migration.populate_counters(apps, None)
+        self.assertInSync()
+
+
+class FilmUserBatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='user', email='user@example.com', password='password')
+        cls.films = [Film.objects.create(title=f'Película {i}', year=2000 + i)
+                     for i in range(4)]
+        FilmUser.objects.create(user=cls.user, film=cls.films[1], state=1,
+                                note=5)
+        FilmUser.objects.create(user=cls.user, film=cls.films[2], state=1,
+                                note=8, favorite=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def batch(self, items):
+        return self.client.post('/api/userfilms/batch/', items,
+                                content_type='application/json')
+
+    def test_mixed_batch(self):
+        missing = uuid.uuid4()
+        response = self.batch([
+            {'uuid': str(self.films[0].pk), 'state': 2},
+            {'uuid': str(self.films[1].pk), 'state': 1, 'note': 9},
+            {'uuid': str(self.films[2].pk), 'state': 0},
+            {'uuid': str(self.films[3].pk), 'state': 0},
+            {'uuid': str(missing), 'state': 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['deleted'], 1)
+        self.assertEqual(response.data['not_found'], [missing])
+
+        states = dict(FilmUser.objects.filter(user=self.user).values_list(
+            'film_id', 'note'))
+        self.assertEqual(states, {self.films[0].pk: None,
+                                  self.films[1].pk: 9})
+        self.assertEqual(list(FilmUserTombstone.objects.filter(
+            user=self.user).values_list('film_id', flat=True)),
+            [self.films[2].pk])
+        self.assertEqual(Film.objects.filter(pk__in=[
+            film.pk for film in self.films]).rebuild_stats(commit=False), [])
+
+    def test_repeated_film(self):
+        # Gana el último valor de cada película
+        response = self.batch([
+            {'uuid': str(self.films[0].pk), 'state': 1, 'note': 3},
+            {'uuid': str(self.films[0].pk), 'state': 1, 'note': 6},
+        ])
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(FilmUser.objects.get(
+            user=self.user, film=self.films[0]).note, 6)
+
+    def test_invalid_item(self):
+        # Un elemento inválido descarta el lote entero
+        before = list(FilmUser.objects.order_by('pk').values())
+        response = self.batch([
+            {'uuid': str(self.films[0].pk), 'state': 1},
+            {'uuid': str(self.films[1].pk), 'state': 0},
+            {'uuid': str(self.films[2].pk), 'state': 1, 'note': 11},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(FilmUser.objects.order_by('pk').values()),
+                         before)
+        self.assertFalse(FilmUserTombstone.objects.exists())
+
+    def test_rollback(self):
+        # Un error al escribir deshace también las escrituras anteriores
+        before = list(FilmUser.objects.order_by('pk').values())
+        with mock.patch.object(FilmUser.objects, 'bulk_update',
+                               side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.batch([
+                    {'uuid': str(self.films[0].pk), 'state': 1},
+                    {'uuid': str(self.films[1].pk), 'state': 1, 'note': 2},
+                ])
+        self.assertEqual(list(FilmUser.objects.order_by('pk').values()),
+                         before)
+
+
+class CursorPaginationTests(TestCase):
+    # Con ?cursor= cada película sale una vez, en orden, también con
+    # valores repetidos del campo de ordenación (desempate por uuid)
+    orderings = ['title', '-title', 'year', '-year', 'favorites',
+                 '-favorites', 'average_note', '-average_note']
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(20):
+            film = Film.objects.create(title=f'Película {i % 7}',
+                                       year=2000 + i % 3)
+            Film.objects.filter(pk=film.pk).update(
+                favorites=i % 4, average_note=i % 5 / 2)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, query):
+        response = self.client.get('/api/films/' + query)
+        self.assertEqual(response.status_code, 200)
+        # Las respuestas de la caché no tienen data
+        return response.json()
+
+    def walk(self, query, link):
+        # Páginas siguiendo next_link o previous_link hasta el final
+        pages = []
+        while query:
+            data = self.get(query)
+            pages.append([film['id'] for film in data['results']])
+            query = data[link]
+        return pages
+
+    def test_orderings(self):
+        values = {str(pk): value for pk, *value in Film.objects.values_list(
+            'pk', 'title', 'year', 'favorites', 'average_note')}
+        fields = ['title', 'year', 'favorites', 'average_note']
+        for ordering in self.orderings:
+            with self.subTest(ordering=ordering):
+                pages = self.walk(f'?cursor=&ordering={ordering}',
+                                  'next_link')
+                self.assertEqual(len(pages), 3)
+                films = [pk for page in pages for pk in page]
+                self.assertEqual(sorted(films), sorted(values))
+                field = fields.index(ordering.lstrip('-'))
+                keys = [values[pk][field] for pk in films]
+                self.assertEqual(keys, sorted(
+                    keys, reverse=ordering.startswith('-')))
+
+                # Hacia atrás desde la última página, las mismas páginas
+                last = self.get(f'?cursor=&ordering={ordering}')
+                while last['next_link']:
+                    last = self.get(last['next_link'])
+                backwards = self.walk(last['previous_link'], 'previous_link')
+                self.assertEqual(backwards[::-1], pages[:-1])
+
+    def test_malformed_cursor(self):
+        def encode(value):
+            return base64.urlsafe_b64encode(
+                json.dumps(value).encode()).decode()
+        pk = str(Film.objects.first().pk)
+        for cursor in ['no-es-base64!', encode([1, 2]), encode('texto'),
+                       encode({'value': {'a': 1}, 'pk': pk}),
+                       encode({'value': 'Película', 'pk': 'no-es-uuid'}),
+                       encode({'value': 'Película'})]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    '/api/films/', {'cursor': cursor, 'ordering': 'title'})
+                self.assertEqual(response.status_code, 404)
+        response = self.client.get('/api/films/', {
+            'cursor': encode({'value': 'texto', 'pk': pk}),
+            'ordering': 'year'})
+        self.assertEqual(response.status_code, 404)
+
+
+class UserStatsTests(TestCase):
+    # Los contadores de la lista del usuario (total y por género) deben
+    # coincidir con rebuild_user_stats tras cada cambio
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='user', email='user@example.com', password='password')
+        genres = [FilmGenre.objects.create(name=f'Género {i}')
+                  for i in range(3)]
+        cls.films = []
+        for i in range(3):
+            film = Film.objects.create(title=f'Película {i}', year=2000 + i)
+            film.genres.set(genres[:i + 1])
+            cls.films.append(film)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def counters(self):
+        # Las filas a cero equivalen a no tener fila
+        return {row.pop('genre_id'): row for row in UserStats.objects
+                .filter(user=self.user).values('genre_id', *UserStats.FIELDS)
+                if any(row[field] for field in UserStats.FIELDS)}
+
+    def assertMatchesRebuild(self):
+        incremental = self.counters()
+        UserStats.objects.rebuild([self.user.pk])
+        self.assertEqual(incremental, self.counters())
+
+    def test_deltas(self):
+        film, other, last = self.films
+        steps = [
+            ('nota', film, {'state': 1, 'note': 8, 'favorite': True}),
+            ('otra película', other, {'state': 2, 'note': 3}),
+            ('cambio de estado', other, {'state': 1, 'note': 3}),
+            ('sin favorito', film, {'state': 1, 'note': 8}),
+            ('sin nota', film, {'state': 1, 'note': None}),
+            ('tercera', last, {'state': 1, 'favorite': True, 'note': 10}),
+            ('borrado', other, {'state': 0}),
+            ('borrado con favorito', last, {'state': 0}),
+        ]
+        for step, target, values in steps:
+            with self.subTest(step=step):
+                response = self.client.post('/api/userfilms/', dict(
+                    uuid=str(target.pk), **values),
+                    content_type='application/json')
+                self.assertEqual(response.status_code, 200)
+                self.assertMatchesRebuild()
@@ -1,18 +1,159 @@
+import base64
+import hashlib
+import json
+import math
+import uuid
 from collections import OrderedDict
-from rest_framework import viewsets, filters, status, views, authentication, permissions
+from datetime import timedelta
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Q
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import viewsets, filters, status, generics, authentication, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Film, FilmGenre, FilmUser
+from server.renderers import NDJSONRenderer
+from .cache import CachedResponseMixin, get_versions
+from .facets import FACETS, facet_counts
+from .filters import FilmFilterBackend, FilmFilterSet, FilmSearchFilter
+from .models import (Film, FilmGenre, FilmUser, FilmUserTombstone,
+                     deferred_film_stats)
+from .optimizers import optimize_queryset
+from .rankings import RANKINGS
+from .recommendations import popular_films, recommended_films
 from .serializers import (FilmSerializer, FilmGenreSerializer,
-                          FilmUserSerializer)
+                          FilmListSerializer, FilmUserSerializer,
+                          FilmUserBatchItemSerializer)
 
 
 class ExtendedPagination(PageNumberPagination):
     page_size = 8
 
+    # Paginación por cursor (keyset) con ?cursor= sobre los ordering_fields
+    cursor_query_param = 'cursor'
+    count_cache_timeout = 60
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_fields = [
+            field for field in getattr(view, 'ordering_fields', None) or []
+            if '__' not in field]
+        if self.keyset_fields and self.cursor_query_param in request.query_params:
+            return self.paginate_keyset(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_keyset_ordering(self, queryset):
+        # Campo de ordenación actual (o el título) con el uuid como desempate
+        ordering = (queryset.query.order_by or ['title'])[0]
+        if not isinstance(ordering, str) \
+                or ordering.lstrip('-') not in self.keyset_fields:
+            ordering = 'title'
+        return ordering.lstrip('-'), ordering.startswith('-')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound('Cursor inválido')
+        # Un objeto con un valor escalar y el uuid de la última película
+        if not isinstance(cursor, dict) or \
+                isinstance(cursor.get('value'), (dict, list)):
+            raise NotFound('Cursor inválido')
+        return cursor
+
+    def encode_cursor(self, film, backwards=False):
+        cursor = {'value': getattr(film, self.field),
+                  'pk': str(film.pk), 'backwards': backwards}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode())
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, encoded.decode())
+
+    def paginate_keyset(self, queryset, request):
+        self.request = request
+        self.field, descending = self.get_keyset_ordering(queryset)
+        cursor = self.decode_cursor(request)
+        backwards = bool(cursor and cursor.get('backwards'))
+        page_size = self.get_page_size(request)
+
+        # Al retroceder recorremos el orden inverso y damos la vuelta
+        self.count_queryset = queryset
+        if descending != backwards:
+            direction, prefix = 'lt', '-'
+        else:
+            direction, prefix = 'gt', ''
+        queryset = queryset.order_by(prefix + self.field, prefix + 'pk')
+        if cursor:
+            try:
+                queryset = queryset.filter(
+                    Q(**{f'{self.field}__{direction}': cursor['value']})
+                    | Q(**{self.field: cursor['value'],
+                           f'pk__{direction}': cursor['pk']}))
+            except (KeyError, TypeError, ValueError, ValidationError,
+                    DjangoValidationError):
+                # Valores que no encajan con el campo (?ordering=year con
+                # un texto, un uuid mal formado...)
+                raise NotFound('Cursor inválido')
+
+        films = list(queryset[:page_size + 1])
+        has_more = len(films) > page_size
+        films = films[:page_size]
+        if backwards:
+            films.reverse()
+
+        self.page = None
+        self.next_cursor = self.previous_cursor = None
+        if films and (has_more or backwards):
+            self.next_cursor = self.encode_cursor(films[-1])
+        if films and (has_more if backwards else cursor):
+            self.previous_cursor = self.encode_cursor(films[0], True)
+        return films
+
+    def get_cached_count(self):
+        # Un COUNT(*) por filtro y minuto en lugar de uno por página
+        sql, params = self.count_queryset.query.sql_with_params()
+        key = 'pagination:count:' + hashlib.md5(
+            repr((sql, params)).encode()).hexdigest()
+        cache = caches[settings.CATALOG_CACHE]
+        count = cache.get(key)
+        if count is None:
+            count = self.count_queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    def get_keyset_response(self, data):
+        count = self.get_cached_count()
+        page_size = self.get_page_size(self.request)
+        return Response({
+            'count': count,
+            'num_pages': math.ceil(count / page_size),
+            'page_number': None,
+            'page_size': page_size,
+            'next_link': self.next_cursor and self.next_cursor.split('/')[-1],
+            'previous_link': self.previous_cursor and self.previous_cursor.split('/')[-1],
+            'results': data
+        })
+
     def get_paginated_response(self, data):
 
+        if self.page is None:
+            return self.get_keyset_response(data)
+
         # Recuperamos los valores por defecto
         next_link = self.get_next_link()
         previous_link = self.get_previous_link()
@@ -36,66 +177,435 @@ class ExtendedPagination(PageNumberPagination):
         })
 
 
-class FilmViewSet(viewsets.ReadOnlyModelViewSet):
+class FilmUserPagination(ExtendedPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class OptimizedQuerysetMixin:
+
+    def get_queryset(self):
+        # Prefetch/select_related/only según los campos que se van a
+        # serializar (incluidos ?fields= y ?expand=)
+        return optimize_queryset(
+            super().get_queryset(), self.get_serializer())
+
+
+async def async_chunks(chunks):
+    # Con ASGI cada bloque se genera en el hilo de la base de datos; un
+    # iterador síncrono obligaría a Django a leerlo entero antes de enviarlo
+    chunks = iter(chunks)
+    while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+        yield chunk
+
+
+class NDJSONStreamMixin:
+    # ?format=ndjson devuelve el listado completo, sin paginar, con un objeto
+    # por línea. Se lee y serializa por bloques mientras se envía: la memoria
+    # no crece con el listado y el primer bloque sale enseguida
+    stream_chunk_size = 1000
+
+    def get_renderers(self):
+        return super().get_renderers() + [NDJSONRenderer()]
+
+    def is_streaming(self):
+        return self.request.accepted_renderer.format == 'ndjson'
+
+    def stream_lines(self, queryset):
+        renderer = self.request.accepted_renderer
+        rows = queryset.iterator(self.stream_chunk_size)
+        while chunk := list(islice(rows, self.stream_chunk_size)):
+            yield renderer.render(self.get_serializer(chunk, many=True).data)
+
+    def stream_response(self, lines):
+        if isinstance(self.request._request, ASGIRequest):
+            lines = async_chunks(lines)
+        response = StreamingHttpResponse(
+            lines, content_type=NDJSONRenderer.media_type)
+        response['X-Accel-Buffering'] = 'no'  # sin buffer en nginx
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if self.is_streaming():
+            return self.stream_response(self.stream_lines(
+                self.filter_queryset(self.get_queryset())))
+        return super().list(request, *args, **kwargs)
+
+
+def film_list_versions(params):
+    # El orden o el filtro por los contadores (y la faceta de notas) cambian
+    # con cada nota; el resto de listados sólo con las películas de la página
+    stats = any(field in params.get('ordering', '')
+                for field in Film.STATS_FIELDS) or 'rating' in params \
+        or 'rating' in params.get('facets', '').split(',')
+    return ['films', 'film-stats'] if stats else ['films']
+
+
+class FilmViewSet(NDJSONStreamMixin, CachedResponseMixin,
+                  OptimizedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Film.objects.all()
     serializer_class = FilmSerializer
 
     # Sistema de filtros
-    filter_backends = [DjangoFilterBackend,  # edited
-                       filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [FilmFilterBackend,  # edited
+                       FilmSearchFilter, filters.OrderingFilter]
 
-    search_fields = ['title', 'year', 'genres__name']
+    # Búsqueda por título, año, argumento y géneros (ver search.py)
     ordering_fields = ['title', 'year',
                        'genres__name', 'favorites', 'average_note']
-    filterset_fields = {
-        'year': ['lte', 'gte'],  # Año menor o igual, año mayor o igual
-        'genres': ['exact']      # Género exacto
-    }
+    filterset_class = FilmFilterSet
+    filterset = None
 
     # Sistema de paginación
     pagination_class = ExtendedPagination
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return FilmListSerializer
+        return FilmSerializer
 
-class GenreViewSet(viewsets.ReadOnlyModelViewSet):
+    def get_cache_dependencies(self, page):
+        return [f'film:{film.pk}' for film in page]
+
+    def get_facets(self):
+        # ?facets=genres,decade,rating añade los recuentos de cada valor con
+        # los filtros actuales (ver facets.py)
+        requested = self.request.query_params.get('facets')
+        if not requested:
+            return None
+        requested = requested.split(',')
+        if not set(requested) <= set(FACETS):
+            raise ValidationError({'facets': 'Facetas válidas: ' +
+                                   ', '.join(FACETS)})
+        cleaned = self.filterset.form.cleaned_data
+        params = {name: int(value) for name, value in cleaned.items()
+                  if value is not None and name != 'genres'}
+        params['genres'] = [genre.pk for genre in cleaned.get('genres', [])]
+        params['search'] = self.request.query_params.get('search')
+        return facet_counts(params, requested)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        facets = self.get_facets()
+        if facets is not None:
+            response.data['facets'] = facets
+        return response
+
+    def get_cache_versions(self):
+        if 'pk' not in self.kwargs:
+            return get_versions(
+                *film_list_versions(self.request.query_params))
+        try:
+            pk = uuid.UUID(self.kwargs['pk'])
+        except ValueError:
+            pk = self.kwargs['pk']
+        return get_versions(f'film:{pk}', 'genres')
+
+
+class GenreViewSet(NDJSONStreamMixin, CachedResponseMixin,
+                   OptimizedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = FilmGenre.objects.all()
     serializer_class = FilmGenreSerializer
     lookup_field = 'slug'  # identificaremos los géneros usando su slug
 
+    # Mejores películas de cada género, ?top=average_note|favorites
+    top_films_size = 5
+    top_films_orderings = ['average_note', 'favorites']
+    ordering_fields = None  # se definen en la acción films
+
+    def get_top_films_ordering(self):
+        ordering = self.request.query_params.get('top', 'average_note')
+        if ordering not in self.top_films_orderings:
+            raise ValidationError({'top': 'Ordenaciones válidas: ' +
+                                   ', '.join(self.top_films_orderings)})
+        return ordering
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        top_films = self.get_serializer().fields.get('top_films')
+        if top_films is None:
+            return queryset
+        films = optimize_queryset(
+            Film.objects.order_by(f'-{self.get_top_films_ordering()}', 'id'),
+            top_films.child)
+        return queryset.prefetch_related(Prefetch(
+            'film_genres', queryset=films[:self.top_films_size],
+            to_attr='top_films'))
+
+    def get_cache_versions(self):
+        if self.action == 'films':
+            return get_versions(
+                'genres', *film_list_versions(self.request.query_params))
+        # Las mejores películas dependen de los contadores de las películas
+        return get_versions('films', 'genres', 'film-stats')
 
-class FilmUserViewSet(views.APIView):
+    def get_cache_dependencies(self, page):
+        if self.action == 'films':
+            return [f'film:{film.pk}' for film in page]
+        return []
+
+    @action(detail=True, serializer_class=FilmListSerializer,
+            pagination_class=ExtendedPagination,
+            filter_backends=[FilmSearchFilter, filters.OrderingFilter],
+            ordering_fields=['title', 'year', 'favorites', 'average_note'])
+    def films(self, request, *args, **kwargs):
+        return self.cached(self.list_films, request, *args, **kwargs)
+
+    def list_films(self, request, *args, **kwargs):
+        # Listado paginado de las películas del género
+        genre = get_object_or_404(FilmGenre, slug=kwargs[self.lookup_field])
+        queryset = self.filter_queryset(optimize_queryset(
+            genre.film_genres.all(), self.get_serializer()))
+        if self.is_streaming():
+            return self.stream_response(self.stream_lines(queryset))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class RankingView(CachedResponseMixin, OptimizedQuerysetMixin,
+                  generics.ListAPIView):
+    # Lee la clasificación ya ordenada (ver rankings.py)
+    queryset = Film.objects.all()
+    serializer_class = FilmListSerializer
+    pagination_class = ExtendedPagination
+
+    def get_queryset(self):
+        kind = self.kwargs['kind']
+        if kind not in RANKINGS:
+            raise NotFound('Clasificación desconocida')
+        return super().get_queryset().filter(
+            rankings__kind=kind).order_by('rankings__position')
+
+    def get_cache_versions(self):
+        return get_versions(f"ranking:{self.kwargs['kind']}", 'films')
+
+    def get_cache_dependencies(self, page):
+        return [f'film:{film.pk}' for film in page]
+
+
+class FilmUserViewSet(NDJSONStreamMixin, generics.GenericAPIView):
     authentication_classes = [authentication.SessionAuthentication]  # new
     permission_classes = [permissions.IsAuthenticated]  # new
+    serializer_class = FilmUserSerializer
+    throttle_scope = 'userfilms'
+
+    # Sistema de filtros y paginación
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['state', 'favorite']
+    pagination_class = FilmUserPagination
+
+    def get_queryset(self):
+        return optimize_queryset(
+            FilmUser.objects.filter(user=self.request.user),
+            self.get_serializer())
+
+    def get_since(self):
+        # El token de sincronización es la fecha de la anterior consulta
+        since = self.request.query_params.get('since')
+        if since is None:
+            return None
+        try:
+            # Sólo fechas con hora: parse_datetime acepta también 2026-10-18
+            parsed = parse_datetime(since) if len(since) > 10 else None
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({'since': 'Token de sincronización inválido'})
+        # Sin zona horaria se interpreta en la del servidor
+        since = parsed if timezone.is_aware(parsed) else \
+            timezone.make_aware(parsed)
+        # Los borrados anteriores ya se han podido purgar
+        if since < timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+            raise ValidationError({'since': 'Token de sincronización caducado'})
+        return since
 
     def get(self, request, *args, **kwargs):
-        queryset = FilmUser.objects.filter(user=self.request.user)
-        serializer = FilmUserSerializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        sync_token = timezone.now().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        since = self.get_since()
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if since:
+            queryset = queryset.filter(
+                updated_at__gte=since).order_by('updated_at', 'pk')
+
+        if self.is_streaming():
+            response = self.stream_response(
+                self.stream_sync(queryset, since))
+            response['X-Sync-Token'] = sync_token
+            return response
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data['sync_token'] = sync_token
+
+        # El cliente aplica primero los borrados y luego los resultados
+        if since:
+            response.data['deleted'] = list(FilmUserTombstone.objects.filter(
+                user=request.user, deleted_at__gte=since).values_list(
+                    'film_id', flat=True).distinct())
+        return response
+
+    def stream_sync(self, queryset, since):
+        # Primero una línea {"deleted": film_id} por cada borrado
+        if since:
+            deleted = FilmUserTombstone.objects.filter(
+                user=self.request.user, deleted_at__gte=since).values_list(
+                    'film_id', flat=True).distinct()
+            renderer = self.request.accepted_renderer
+            rows = deleted.iterator(self.stream_chunk_size)
+            while chunk := list(islice(rows, self.stream_chunk_size)):
+                yield renderer.render(
+                    [{'deleted': film_id} for film_id in chunk])
+        yield from self.stream_lines(queryset)
 
     def post(self, request, *args, **kwargs):
+        serializer = FilmUserBatchItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        values = dict(serializer.validated_data)
+        film_id = values.pop('uuid')
         try:
-            film = Film.objects.get(id=request.data['uuid'])
-        except Film.DoesNotExist:
-            return Response(
-                {'status': 'Film not found'},
-                status=status.HTTP_404_NOT_FOUND)
+            with transaction.atomic():
+                return self.save_film_user(request.user, film_id, values)
+        except IntegrityError:
+            # Otra petición la ha creado a la vez: la actualizamos
+            return self.post(request, *args, **kwargs)
 
-        film_user, created = FilmUser.objects.get_or_create(
-            user=request.user, film=film)
+    def save_film_user(self, user, film_id, values):
+        # La fila se bloquea hasta el final de la transacción: dos cambios a
+        # la vez no calculan el delta de estadísticas desde el mismo estado
+        try:
+            film_user = FilmUser.objects.select_for_update().get(
+                user=user, film=film_id)
+        except FilmUser.DoesNotExist:
+            film_user = None
 
-        # Configuramos cada campo
-        film_user.state = request.data.get('state', 0)
-        film_user.favorite = request.data.get('favorite', False)
-        film_user.note = request.data.get('note', -1)
-        film_user.review = request.data.get('review', None)
+        if film_user is None:
+            if not Film.objects.filter(pk=film_id).exists():
+                return Response(
+                    {'status': 'Film not found'},
+                    status=status.HTTP_404_NOT_FOUND)
+            # Marcar como NO VISTA una película que no está en la lista
+            if values['state'] == 0:
+                return Response(
+                    {'status': 'Deleted'}, status=status.HTTP_200_OK)
+            FilmUser.objects.create(user=user, film_id=film_id, **values)
+            return Response(
+                {'status': 'Saved'}, status=status.HTTP_200_OK)
 
         # Si se marca la pelicula como NO VISTA la borramos automáticamente
-        if int(film_user.state) == 0:
+        if values['state'] == 0:
             film_user.delete()
             return Response(
                 {'status': 'Deleted'}, status=status.HTTP_200_OK)
-        # En otro caso guardamos los campos de la película de usuario
-        else:
-            film_user.save()
+
+        # Sólo se guardan los campos que cambian; si no cambia ninguno no se
+        # escribe nada (ni estadísticas, ni token de sincronización)
+        changed = [field for field, value in values.items()
+                   if getattr(film_user, field) != value]
+        if changed:
+            for field in changed:
+                setattr(film_user, field, values[field])
+            film_user.save(update_fields=changed + ['updated_at'])
 
         return Response(
             {'status': 'Saved'}, status=status.HTTP_200_OK)
+
+
+class FilmUserBatchView(generics.GenericAPIView):
+    authentication_classes = [authentication.SessionAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = FilmUserBatchItemSerializer
+    throttle_scope = 'userfilms'
+    max_items = 1000
+
+    FIELDS = ['state', 'favorite', 'note', 'review']
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(
+            data=request.data, many=True, max_length=self.max_items)
+        serializer.is_valid(raise_exception=True)
+
+        # Si una película se repite nos quedamos con su último valor
+        items = {item['uuid']: item for item in serializer.validated_data}
+        films = set(Film.objects.filter(
+            pk__in=items).values_list('pk', flat=True))
+        existing = {
+            film_user.film_id: film_user for film_user in
+            FilmUser.objects.filter(user=request.user, film_id__in=films)}
+
+        # Separamos las altas, los cambios y los borrados (estado 0)
+        now = timezone.now()
+        created, updated, deleted = [], [], []
+        for film_id in films:
+            values = {field: items[film_id][field] for field in self.FIELDS}
+            film_user = existing.get(film_id)
+            if values['state'] == 0:
+                if film_user:
+                    deleted.append(film_user.pk)
+            elif film_user is None:
+                created.append(FilmUser(
+                    user=request.user, film_id=film_id, **values))
+            elif any(getattr(film_user, field) != value
+                     for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(film_user, field, value)
+                film_user.updated_at = now
+                updated.append(film_user)
+
+        # Una transacción y un recálculo de estadísticas por película y de
+        # los contadores del usuario
+        with transaction.atomic(), \
+                deferred_film_stats(users=[request.user.pk]) as affected:
+            FilmUser.objects.bulk_create(
+                created, batch_size=500, update_conflicts=True,
+                unique_fields=['film', 'user'],
+                update_fields=self.FIELDS + ['updated_at'])
+            FilmUser.objects.bulk_update(
+                updated, self.FIELDS + ['updated_at'], batch_size=500)
+            FilmUser.objects.filter(pk__in=deleted).delete()
+            affected.update(
+                film_user.film_id for film_user in created + updated)
+
+        return Response({
+            'status': 'Saved',
+            'created': len(created),
+            'updated': len(updated),
+            'deleted': len(deleted),
+            'not_found': [pk for pk in items if pk not in films],
+        }, status=status.HTTP_200_OK)
+
+
+class RecommendationView(generics.GenericAPIView):
+    authentication_classes = [authentication.SessionAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = FilmListSerializer
+    default_limit = 20
+    max_limit = 100
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get(
+                'limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': 'Debe ser un número entero'})
+        return max(1, min(limit, self.max_limit))
+
+    def get(self, request, *args, **kwargs):
+        limit = self.get_limit()
+        scores = recommended_films(request.user, limit)
+        films = optimize_queryset(
+            Film.objects.filter(pk__in=scores), self.get_serializer())
+        films = sorted(films, key=lambda film: -scores[film.pk])
+
+        # Usuarios nuevos o sin vecinas calculadas: las más populares
+        personalized = bool(films)
+        if not personalized:
+            films = optimize_queryset(
+                popular_films(request.user), self.get_serializer())[:limit]
+
+        serializer = self.get_serializer(films, many=True)
+        return Response({'personalized': personalized,
+                         'results': serializer.data})
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from jobs.queue import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las tareas en segundo plano encoladas en la base de datos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Procesa las tareas pendientes y termina')
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Segundos de espera cuando no hay tareas')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Worker iniciado')
+        while True:
+            close_old_connections()
+            job = claim_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            ok = run_job(job)
+            self.stdout.write(f"{'OK' if ok else 'ERROR'} {job.name} {job.args}")
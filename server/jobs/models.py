@@ -0,0 +1,52 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, "Pendiente"),
+        (RUNNING, "En ejecución"),
+        (FAILED, "Fallida"))
+
+    name = models.CharField(
+        max_length=100, verbose_name="Tarea")
+    args = models.JSONField(
+        default=dict, blank=True, verbose_name="Argumentos")
+    dedup_key = models.CharField(
+        max_length=200, null=True, blank=True, verbose_name="Clave única")
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    run_at = models.DateTimeField(
+        default=timezone.now, verbose_name="Ejecutar a partir de")
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Intentos")
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5, verbose_name="Intentos máximos")
+    last_error = models.TextField(
+        blank=True, verbose_name="Último error")
+    locked_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="En ejecución desde")
+    created_at = models.DateTimeField(
+        auto_now_add=True)
+
+    class Meta:
+        verbose_name = "tarea"
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+        constraints = [
+            # Sólo puede haber una tarea pendiente por clave: las demás se
+            # agrupan en ella
+            models.UniqueConstraint(
+                fields=['dedup_key'], condition=Q(status='pending'),
+                name='job_pending_dedup_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
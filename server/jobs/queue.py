@@ -0,0 +1,102 @@
+import logging
+import traceback
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Tareas registradas: nombre -> función
+registry = {}
+
+
+def task(name):
+    def register(func):
+        registry[name] = func
+        return func
+    return register
+
+
+def enqueue(name, args=None, dedup_key=None, delay=0, max_attempts=5):
+    # Guardamos la tarea en la misma transacción que la petición; si ya hay
+    # una pendiente con la misma clave ésta se descarta (se agrupan)
+    enqueue_many(name, [(args or {}, dedup_key)], delay, max_attempts)
+
+
+def enqueue_many(name, jobs, delay=0, max_attempts=5):
+    # Varias tareas del mismo tipo, (args, dedup_key), en un único INSERT
+    if settings.JOBS_EAGER:
+        for args, _ in jobs:
+            transaction.on_commit(partial(registry[name], **args))
+        return
+    run_at = timezone.now() + timedelta(seconds=delay)
+    Job.objects.bulk_create([
+        Job(name=name, args=args, dedup_key=dedup_key,
+            max_attempts=max_attempts, run_at=run_at)
+        for args, dedup_key in jobs], ignore_conflicts=True)
+
+
+def requeue_expired_jobs():
+    # Tareas en ejecución desde hace más de JOBS_LEASE segundos: su worker
+    # ha muerto y se reintentan como un fallo más
+    # (las anteriores a locked_at no tienen fecha)
+    expired = Job.objects.filter(
+        Q(locked_at__lt=timezone.now() - timedelta(
+            seconds=settings.JOBS_LEASE)) | Q(locked_at__isnull=True),
+        status=Job.RUNNING)
+    for job in expired:
+        logger.warning('La tarea %s no ha terminado, se reintenta', job)
+        retry_job(job, f'Sin terminar tras {settings.JOBS_LEASE} segundos')
+
+
+def claim_job():
+    # Marcamos como en ejecución la siguiente tarea pendiente; el update
+    # condicional evita que dos workers se queden con la misma
+    requeue_expired_jobs()
+    with transaction.atomic():
+        jobs = Job.objects.filter(
+            status=Job.PENDING, run_at__lte=timezone.now())
+        if connection.features.has_select_for_update_skip_locked:
+            jobs = jobs.select_for_update(skip_locked=True)
+        job = jobs.first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(pk=job.pk, status=Job.PENDING).update(
+            status=Job.RUNNING, attempts=F('attempts') + 1,
+            locked_at=timezone.now())
+    if not claimed:
+        return claim_job()
+    job.refresh_from_db()
+    return job
+
+
+def run_job(job):
+    try:
+        registry[job.name](**job.args)
+    except Exception:
+        logger.exception('La tarea %s ha fallado', job)
+        retry_job(job, traceback.format_exc())
+        return False
+    job.delete()
+    return True
+
+
+def retry_job(job, error):
+    job.last_error = error
+    job.locked_at = None
+    if job.attempts >= job.max_attempts or job.name not in registry:
+        job.status = Job.FAILED
+    else:
+        # Reintento con espera exponencial: 10s, 20s, 40s...
+        job.status = Job.PENDING
+        job.run_at = timezone.now() + timedelta(seconds=5 * 2 ** job.attempts)
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        # Mientras tanto se ha encolado otra igual que hará el trabajo
+        job.delete()
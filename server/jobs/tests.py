@@ -0,0 +1,101 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim_job, enqueue, enqueue_many, registry, run_job
+
+
+def fail():
+    raise RuntimeError('Fallo')
+
+
+@override_settings(JOBS_EAGER=False, JOBS_LEASE=60)
+@mock.patch.dict(registry, {'tests.ok': lambda **kwargs: None,
+                            'tests.fail': fail})
+class QueueTests(TestCase):
+
+    def make_due(self):
+        Job.objects.update(run_at=timezone.now())
+
+    def test_dedup(self):
+        # Una sola tarea pendiente por clave
+        enqueue('tests.ok', {'film_id': 1}, dedup_key='film:1')
+        enqueue('tests.ok', {'film_id': 1}, dedup_key='film:1')
+        enqueue_many('tests.ok', [({'film_id': 1}, 'film:1'),
+                                  ({'film_id': 2}, 'film:2')])
+        self.assertEqual(
+            sorted(Job.objects.values_list('dedup_key', flat=True)),
+            ['film:1', 'film:2'])
+
+        # En ejecución ya no agrupa: el cambio posterior necesita otra
+        job = claim_job()
+        enqueue('tests.ok', dedup_key=job.dedup_key)
+        self.assertEqual(Job.objects.filter(
+            dedup_key=job.dedup_key).count(), 2)
+
+    def test_run(self):
+        enqueue('tests.ok')
+        self.assertTrue(run_job(claim_job()))
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_backoff(self):
+        enqueue('tests.fail', max_attempts=3)
+        for attempt in range(1, 3):
+            job = claim_job()
+            self.assertEqual(job.attempts, attempt)
+            with self.assertLogs('jobs.queue', 'ERROR'):
+                self.assertFalse(run_job(job))
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.PENDING)
+            self.assertIn('Fallo', job.last_error)
+            # Espera exponencial: 10s, 20s...
+            wait = (job.run_at - timezone.now()).total_seconds()
+            self.assertAlmostEqual(wait, 5 * 2 ** attempt, delta=2)
+            self.assertIsNone(claim_job())
+            self.make_due()
+
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertFalse(run_job(claim_job()))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNone(claim_job())
+
+    def test_requeue_dead_worker(self):
+        enqueue('tests.ok')
+        job = claim_job()
+        self.assertEqual(job.status, Job.RUNNING)
+
+        # Dentro del plazo sigue siendo del worker
+        self.assertIsNone(claim_job())
+        Job.objects.update(locked_at=timezone.now() - timedelta(seconds=61))
+
+        # Pasado JOBS_LEASE vuelve a la cola como un intento fallido
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertIsNone(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertIsNone(job.locked_at)
+        self.assertIn('Sin terminar', job.last_error)
+        self.make_due()
+        job = claim_job()
+        self.assertEqual(job.attempts, 2)
+        self.assertTrue(run_job(job))
+
+    def test_requeue_without_lease(self):
+        # Tareas en ejecución de antes de locked_at
+        enqueue('tests.ok')
+        Job.objects.update(status=Job.RUNNING, attempts=1)
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertIsNone(claim_job())
+        self.assertEqual(Job.objects.get().status, Job.PENDING)
+
+    def test_requeue_last_attempt(self):
+        enqueue('tests.ok', max_attempts=1)
+        claim_job()
+        Job.objects.update(locked_at=timezone.now() - timedelta(seconds=61))
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertIsNone(claim_job())
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
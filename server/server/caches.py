@@ -0,0 +1,46 @@
+from urllib.parse import parse_qsl, unquote, urlsplit
+from django.core.exceptions import ImproperlyConfigured
+
+# Configuración de la caché a partir de una URL de entorno, como DATABASE_URL
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def cache_from_url(url):
+    # locmem://, redis://host:6379/0, memcached://host:11211,
+    # db://tabla (requiere createcachetable), file:///ruta o dummy://.
+    # ?timeout=600 y ?key_prefix=... van a la configuración; el resto de
+    # parámetros, a OPTIONS
+    parts = urlsplit(url)
+    if parts.scheme not in BACKENDS:
+        raise ImproperlyConfigured(f'Caché no soportada: {url}')
+
+    options = dict(parse_qsl(parts.query))
+    cache = {'BACKEND': BACKENDS[parts.scheme]}
+    if 'timeout' in options:
+        cache['TIMEOUT'] = int(options.pop('timeout'))
+    if 'key_prefix' in options:
+        cache['KEY_PREFIX'] = options.pop('key_prefix')
+
+    if parts.scheme in ('redis', 'rediss'):
+        # redis-py entiende la URL completa (usuario, clave y base de datos)
+        cache['LOCATION'] = parts._replace(query='').geturl()
+    elif parts.scheme == 'memcached':
+        cache['LOCATION'] = parts.netloc
+    elif parts.scheme == 'db':
+        cache['LOCATION'] = parts.netloc or 'cache_table'
+    elif parts.scheme == 'file':
+        cache['LOCATION'] = unquote(parts.path)
+    elif parts.scheme == 'locmem' and parts.netloc:
+        cache['LOCATION'] = parts.netloc
+    if options:
+        cache['OPTIONS'] = options
+    return cache
@@ -0,0 +1,157 @@
+import random
+from contextvars import ContextVar
+from urllib.parse import parse_qsl, unquote, urlsplit
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from server.streaming import stream_in_context
+
+# Configuración de la base de datos a partir de URLs de entorno, router
+# primaria/réplicas y middleware de lectura de las propias escrituras
+
+ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgres': 'django.db.backends.postgresql',
+    'postgresql': 'django.db.backends.postgresql',
+}
+
+# Perfil para un único nodo: WAL permite leer mientras otro proceso escribe y
+# las transacciones toman el bloqueo de escritura al empezar en lugar de
+# fallar con "database is locked" a mitad
+SQLITE_WAL_OPTIONS = {
+    'init_command': ';'.join([
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA cache_size=-20000',
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA mmap_size=134217728',
+    ]),
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 20,
+}
+
+STICKY_COOKIE = 'db_primary'
+
+
+def database_from_url(url, conn_max_age=0, pool_size=0, sqlite_wal=True):
+    parts = urlsplit(url)
+    if parts.scheme not in ENGINES:
+        raise ImproperlyConfigured(f'Base de datos no soportada: {url}')
+
+    if parts.scheme == 'sqlite':
+        # sqlite:////ruta/absoluta o sqlite:///ruta/relativa
+        return {
+            'ENGINE': ENGINES['sqlite'],
+            'NAME': parts.path[1:],
+            'CONN_MAX_AGE': conn_max_age,
+            'OPTIONS': dict(SQLITE_WAL_OPTIONS) if sqlite_wal else {},
+        }
+
+    options = dict(parse_qsl(parts.query))
+    if pool_size:
+        # Pool de psycopg: incompatible con las conexiones persistentes
+        options['pool'] = {'min_size': 1, 'max_size': pool_size}
+        conn_max_age = 0
+    return {
+        'ENGINE': ENGINES[parts.scheme],
+        'NAME': unquote(parts.path[1:]),
+        'USER': unquote(parts.username or ''),
+        'PASSWORD': unquote(parts.password or ''),
+        'HOST': parts.hostname or '',
+        'PORT': str(parts.port or ''),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': conn_max_age > 0,
+        'OPTIONS': options,
+    }
+
+
+def database_settings(url, replica_urls='', **kwargs):
+    databases = {'default': database_from_url(url, **kwargs)}
+    for i, replica_url in enumerate(filter(None, replica_urls.split(','))):
+        databases[f'replica{i + 1}'] = dict(
+            database_from_url(replica_url.strip(), **kwargs),
+            TEST={'MIRROR': 'default'})
+    return databases
+
+
+# Estado de la petición actual: si puede leer de las réplicas y si ha escrito
+_request_state = ContextVar('database_request_state', default=None)
+
+
+def read_from_primary():
+    # El resto de lecturas de la petición van a la primaria
+    state = _request_state.get()
+    if state:
+        state['replicas'] = False
+
+
+class PrimaryReplicaRouter:
+    # Sólo las lecturas de REPLICA_MODELS en peticiones de lectura van a las
+    # réplicas; el resto (escrituras, worker, comandos...) usa la primaria
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if (state and state['replicas'] and not state['wrote']
+                and model._meta.label_lower in settings.REPLICA_MODELS):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state:
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    # Tras escribir, el cliente lee de la primaria durante
+    # DATABASE_REPLICA_STICKY_SECONDS para ver sus cambios aunque las
+    # réplicas vayan con retraso
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        state = {
+            'replicas': request.method in ('GET', 'HEAD', 'OPTIONS')
+            and STICKY_COOKIE not in request.COOKIES,
+            'wrote': False,
+        }
+        return state, _request_state.set(state)
+
+    def finish(self, state, response):
+        if state['wrote']:
+            response.set_cookie(
+                STICKY_COOKIE, '1', httponly=True, samesite='Lax',
+                max_age=settings.DATABASE_REPLICA_STICKY_SECONDS)
+        if response.streaming:
+            # El cuerpo se lee con el mismo enrutado que la vista
+            return stream_in_context(response, _request_state, state)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.finish(state, response)
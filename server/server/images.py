@@ -0,0 +1,116 @@
+import os
+from io import BytesIO
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from rest_framework import serializers
+from jobs.queue import enqueue, task
+
+# Derivados de las imágenes subidas: varios anchos en JPEG y WebP guardados
+# junto al original. Los modelos declaran IMAGE_SIZES {campo: [anchos]} y un
+# JSONField image_variants {campo: {formato: {ancho: nombre}}}
+
+FORMATS = {'jpg': 'JPEG', 'webp': 'WEBP'}
+QUALITY = 82
+
+
+def derivative_name(name, width, extension):
+    stem, _ = os.path.splitext(name)
+    return f'{stem}_{width}w.{extension}'
+
+
+def render_derivatives(field_file, widths):
+    with field_file.storage.open(field_file.name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+
+    variants = {}
+    # Nunca ampliamos: como mucho el ancho del original
+    for width in sorted({min(width, image.width) for width in widths}):
+        resized = image.copy()
+        resized.thumbnail((width, image.height), Image.LANCZOS)
+        for extension, image_format in FORMATS.items():
+            output = resized
+            if image_format == 'JPEG' and output.mode != 'RGB':
+                output = output.convert('RGB')
+            buffer = BytesIO()
+            output.save(buffer, image_format, quality=QUALITY, optimize=True)
+            name = derivative_name(field_file.name, width, extension)
+            if field_file.storage.exists(name):
+                field_file.storage.delete(name)
+            name = field_file.storage.save(name, ContentFile(buffer.getvalue()))
+            variants.setdefault(extension, {})[str(width)] = name
+    return variants
+
+
+def delete_derivatives(variants):
+    for sizes in variants.values():
+        for name in sizes.values():
+            default_storage.delete(name)
+
+
+@task('images.generate_variants')
+def generate_image_variants(model, pk, fields):
+    # Se ejecuta en el worker: regenera los derivados de los campos
+    # indicados (el post_save resultante invalida las cachés del modelo)
+    model = apps.get_model(model)
+    try:
+        instance = model._default_manager.get(pk=pk)
+        variants = dict(instance.image_variants)
+        for field in fields:
+            delete_derivatives(variants.pop(field, {}))
+            field_file = getattr(instance, field)
+            if field_file:
+                variants[field] = render_derivatives(
+                    field_file, model.IMAGE_SIZES[field])
+        instance.image_variants = variants
+        instance.save(update_fields=['image_variants'])
+    except model.DoesNotExist:
+        pass
+
+
+def image_names(instance):
+    return {field: getattr(instance, field).name or ''
+            for field in instance.IMAGE_SIZES}
+
+
+def remember_image_names(instance, field_names):
+    if all(field in field_names for field in instance.IMAGE_SIZES):
+        instance._image_names = image_names(instance)
+
+
+def update_image_variants(sender, instance, created=False, raw=False,
+                          **kwargs):
+    # post_save: encola los derivados de las imágenes que han cambiado
+    if raw or not (created or hasattr(instance, '_image_names')):
+        return
+    old = getattr(instance, '_image_names', {})
+    current = image_names(instance)
+    changed = [field for field, name in current.items()
+               if name != old.get(field, '')]
+    instance._image_names = current
+    if changed:
+        label = sender._meta.label
+        enqueue('images.generate_variants',
+                {'model': label, 'pk': str(instance.pk), 'fields': changed},
+                dedup_key=f"images:{label}:{instance.pk}:{','.join(changed)}")
+
+
+class SrcsetField(serializers.ReadOnlyField):
+    # {formato: "url 320w, url 640w"} listo para <source srcset="...">
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs.setdefault('source', 'image_variants')
+        super().__init__(**kwargs)
+
+    def to_representation(self, variants):
+        sizes_by_format = (variants or {}).get(self.image_field, {})
+        return {
+            extension: ', '.join(
+                f'{default_storage.url(name)} {width}w'
+                for width, name in sorted(
+                    sizes.items(), key=lambda size: int(size[0])))
+            for extension, sizes in sizes_by_format.items()
+        }
@@ -0,0 +1,255 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from rest_framework import serializers
+from server.streaming import stream_in_context
+from server.throttling import rejection_counts
+
+logger = logging.getLogger(__name__)
+
+# Métricas de rendimiento por vista (tiempo, consultas, serialización y
+# tamaño de la respuesta) en formato Prometheus. Se guardan en memoria en cada
+# proceso: con varios workers Prometheus debe leer cada uno por separado
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)
+
+# nombre -> (tipo, descripción, buckets de los histogramas)
+METRICS = {
+    'http_requests_total': (
+        'counter', 'Peticiones atendidas', None),
+    'http_request_duration_seconds': (
+        'histogram', 'Duración de las peticiones', SECONDS_BUCKETS),
+    'http_request_db_queries': (
+        'histogram', 'Consultas por petición', QUERIES_BUCKETS),
+    'http_request_db_seconds': (
+        'histogram', 'Tiempo en la base de datos por petición',
+        SECONDS_BUCKETS),
+    'http_request_serializer_seconds': (
+        'histogram', 'Tiempo de serialización por petición', SECONDS_BUCKETS),
+    'http_response_size_bytes': (
+        'histogram', 'Tamaño de las respuestas', BYTES_BUCKETS),
+    'db_slow_queries_total': (
+        'counter', 'Consultas más lentas que METRICS_SLOW_QUERY_MS', None),
+    'db_n_plus_one_total': (
+        'counter', 'Peticiones con la misma consulta repetida', None),
+}
+
+_lock = threading.Lock()
+_values = defaultdict(float)  # (nombre, etiquetas) -> valor
+_histograms = {}  # (nombre, etiquetas) -> [cuenta por bucket, suma, total]
+
+# Medidas de la petición en curso (también dentro de sync_to_async)
+_request_metrics = ContextVar('request_metrics', default=None)
+
+
+def inc(name, labels, value=1):
+    with _lock:
+        _values[name, labels] += value
+
+
+def observe(name, labels, value):
+    buckets = METRICS[name][2]
+    with _lock:
+        histogram = _histograms.get((name, labels))
+        if histogram is None:
+            histogram = _histograms[name, labels] = [
+                [0] * (len(buckets) + 1), 0.0, 0]
+        histogram[0][bisect_left(buckets, value)] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"')
+               .replace('\n', r'\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value
+                          in zip(pairs, escaped)) + '}'
+
+
+def render_metrics():
+    with _lock:
+        values = dict(_values)
+        histograms = {key: (list(counts), total, count)
+                      for key, (counts, total, count) in _histograms.items()}
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        if kind == 'counter':
+            lines += [f'{name}{format_labels(labels)} {value:g}'
+                      for (metric, labels), value in sorted(values.items())
+                      if metric == name]
+            continue
+        for (metric, labels), (counts, total, count) in sorted(
+                histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip((*buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket'
+                             f'{format_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {total:g}')
+            lines.append(f'{name}_count{format_labels(labels)} {count}')
+
+    # Los rechazos de la limitación de peticiones se cuentan en la caché
+    name = 'throttle_rejected_total'
+    lines += [f'# HELP {name} Peticiones rechazadas por ámbito',
+              f'# TYPE {name} counter']
+    lines += [f'{name}{format_labels([("scope", scope)])} {count}'
+              for scope, count in rejection_counts().items()]
+    return '\n'.join(lines) + '\n'
+
+
+def query_shape(sql):
+    # Misma consulta con otros parámetros: los IN de distinta longitud y los
+    # números en línea (LIMIT, OFFSET) no cuentan
+    return re.sub(r'\b\d+\b', 'N', re.sub(r'\(%s(, %s)*\)', '(...)', sql))
+
+
+def record_query(execute, sql, params, many, context):
+    state = _request_metrics.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        state['queries'] += 1
+        state['db'] += elapsed
+        state['shapes'][query_shape(sql)] += 1
+        if elapsed * 1000 >= settings.METRICS_SLOW_QUERY_MS:
+            state['slow'] += 1
+            logger.warning('Consulta lenta (%.0fms): %s', elapsed * 1000, sql)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class TimedSerializerMixin:
+    # Suma al tiempo de serialización de la petición el de los serializers
+    # raíz (los anidados ya están incluidos)
+
+    def to_representation(self, instance):
+        state = _request_metrics.get()
+        if state is None or not (self.parent is None or (
+                isinstance(self.parent, serializers.ListSerializer)
+                and self.parent.parent is None)):
+            return super().to_representation(instance)
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            state['serializer'] += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self):
+        # Las conexiones abiertas antes de cargar este módulo
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        state = {'start': time.perf_counter(), 'queries': 0, 'db': 0.0,
+                 'serializer': 0.0, 'slow': 0, 'shapes': Counter()}
+        return state, _request_metrics.set(state)
+
+    def finish(self, state, request, response):
+        if response.streaming:
+            # Las consultas y el tiempo del cuerpo cuentan al terminar de
+            # enviarlo; Server-Timing ya no puede incluirlas
+            return stream_in_context(
+                response, _request_metrics, state,
+                lambda size: self.record(state, request, response, size))
+
+        duration = self.record(state, request, response, len(response.content))
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={state["db"] * 1000:.1f};'
+                f'desc="{state["queries"]} consultas"',
+                f'serializer;dur={state["serializer"] * 1000:.1f}',
+                f'total;dur={duration * 1000:.1f}',
+            ])
+        return response
+
+    def record(self, state, request, response, size):
+        duration = time.perf_counter() - state['start']
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        labels = (('view', view),)
+
+        status = str(response.status_code)
+        inc('http_requests_total',
+            labels + (('method', request.method), ('status', status)))
+        observe('http_request_duration_seconds', labels, duration)
+        observe('http_request_db_queries', labels, state['queries'])
+        observe('http_request_db_seconds', labels, state['db'])
+        observe('http_request_serializer_seconds', labels,
+                state['serializer'])
+        observe('http_response_size_bytes', labels, size)
+        if state['slow']:
+            inc('db_slow_queries_total', labels, state['slow'])
+
+        repeated = [(count, shape) for shape, count in state['shapes'].items()
+                    if count >= settings.METRICS_N_PLUS_ONE_THRESHOLD]
+        if repeated:
+            inc('db_n_plus_one_total', labels)
+            for count, shape in repeated:
+                logger.warning('Posible N+1 en %s (%d veces): %s',
+                               view, count, shape)
+        return duration
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_metrics.reset(token)
+        return self.finish(state, request, response)
+
+    async def __acall__(self, request):
+        state, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_metrics.reset(token)
+        return self.finish(state, request, response)
+
+
+def metrics_view(request):
+    # Sólo para el Prometheus de la red interna (METRICS_ALLOWED_IPS)
+    if not settings.METRICS_ENABLED or \
+            request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(render_metrics(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,52 @@
+# Los cuerpos en streaming se generan después de que los middlewares hayan
+# devuelto la respuesta, fuera de sus variables de contexto. Cada bloque se
+# genera con el valor de la petición y al terminar on_close recibe los bytes
+# enviados
+
+
+def stream_in_context(response, var, value, on_close=None):
+    content = response.streaming_content
+    if response.is_async:
+        content = _aiterate(content, var, value, on_close)
+    else:
+        content = _iterate(content, var, value, on_close)
+    response.streaming_content = content
+    return response
+
+
+def _iterate(content, var, value, on_close):
+    content = iter(content)
+    size = 0
+    try:
+        while True:
+            token = var.set(value)
+            try:
+                chunk = next(content, None)
+            finally:
+                var.reset(token)
+            if chunk is None:
+                break
+            size += len(chunk)
+            yield chunk
+    finally:
+        if on_close:
+            on_close(size)
+
+
+async def _aiterate(content, var, value, on_close):
+    content = aiter(content)
+    size = 0
+    try:
+        while True:
+            token = var.set(value)
+            try:
+                chunk = await anext(content, None)
+            finally:
+                var.reset(token)
+            if chunk is None:
+                break
+            size += len(chunk)
+            yield chunk
+    finally:
+        if on_close:
+            on_close(size)
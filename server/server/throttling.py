@@ -0,0 +1,102 @@
+import logging
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+# Limitación de peticiones con cubos de fichas guardados en THROTTLE_CACHE:
+# cada cubo admite ráfagas de hasta N peticiones y se rellena a N por periodo
+# ('10/min', '5/hour'...). Sólo se lee y escribe la caché, nunca la base de
+# datos. Con una caché compartida (Redis) la lectura y la escritura no son
+# atómicas: con peticiones simultáneas del mismo cliente puede pasar alguna
+# más del límite
+
+
+def get_cache():
+    return caches[settings.THROTTLE_CACHE]
+
+
+def record_rejection(scope):
+    cache = get_cache()
+    key = f'throttle:rejected:{scope}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:  # la clave ha caducado entre add e incr
+        cache.set(key, 1, None)
+
+
+def rejection_counts():
+    # Peticiones rechazadas por ámbito desde el arranque de la caché
+    scopes = list(api_settings.DEFAULT_THROTTLE_RATES)
+    counts = get_cache().get_many(
+        [f'throttle:rejected:{scope}' for scope in scopes])
+    return {scope: counts.get(f'throttle:rejected:{scope}', 0)
+            for scope in scopes}
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    # El ámbito (y con él el límite) depende de cada petición
+
+    def __init__(self):
+        pass
+
+    def get_scope(self, request, view):
+        raise NotImplementedError
+
+    def get_cache_key(self, request, view):
+        # Por usuario con sesión y por IP para los anónimos
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'throttle:{self.scope}:{ident}'
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED:
+            return True
+        self.scope = self.get_scope(request, view)
+        self.rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        cache = get_cache()
+        key = self.get_cache_key(request, view)
+        now = self.timer()
+        tokens, updated = cache.get(key, (self.num_requests, now))
+        self.tokens = min(self.num_requests, tokens + (
+            now - updated) * self.num_requests / self.duration)
+        if self.tokens < 1:
+            record_rejection(self.scope)
+            logger.warning('Petición limitada (%s): %s', self.scope, key)
+            return False
+        # El cubo vuelve a estar lleno tras un periodo sin peticiones
+        cache.set(key, (self.tokens - 1, now), self.duration)
+        return True
+
+    def wait(self):
+        # Segundos hasta que se rellene la siguiente ficha
+        return (1 - self.tokens) * self.duration / self.num_requests
+
+
+class UserThrottle(TokenBucketThrottle):
+    # Límite general de cada usuario ('user') o IP anónima ('anon')
+
+    def get_scope(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return 'user'
+        return 'anon'
+
+
+class ScopedThrottle(TokenBucketThrottle):
+    # Límite propio de las escrituras de las vistas con throttle_scope (login,
+    # registro, recuperación de contraseña, notas...)
+
+    def get_scope(self, request, view):
+        if request.method in SAFE_METHODS:
+            return None
+        return getattr(view, 'throttle_scope', None)
@@ -4,7 +4,9 @@ from django.contrib import admin
 from django.urls import path, include
 
 from rest_framework import routers
+from films import async_views as film_async_views
 from films import views as film_views
+from server.metrics import metrics_view
 
 # Api router
 router = routers.DefaultRouter()
@@ -15,10 +17,23 @@ urlpatterns = [
     # Admin routes
     path('admin/', admin.site.urls),
 
+    # Métricas (Prometheus)
+    path('metrics', metrics_view),
+
     # Api routes
     path('api/', include('authentication.urls')),
     path('api/', include(router.urls)),
-    path('api/userfilms/', film_views.FilmUserViewSet.as_view())
+    path('api/userfilms/', film_views.FilmUserViewSet.as_view()),
+    path('api/userfilms/batch/', film_views.FilmUserBatchView.as_view()),
+    path('api/recommendations/', film_views.RecommendationView.as_view()),
+    path('api/rankings/<slug:kind>/', film_views.RankingView.as_view()),
+
+    # Async api routes (ASGI)
+    path('api/async/films/', film_async_views.film_list),
+    path('api/async/films/<uuid:pk>/', film_async_views.film_detail),
+    path('api/async/genres/', film_async_views.genre_list),
+    path('api/async/genres/<slug:slug>/', film_async_views.genre_detail),
+    path('api/async/userfilms/', film_async_views.userfilm_list),
 ]
 # Serve static files in development server
 if settings.DEBUG: